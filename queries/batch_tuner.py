@@ -0,0 +1,165 @@
+# batch_tuner.py
+"""
+Tamanho de lote (e concorrência, no Cassandra) ajustado durante a carga, por tabela.
+Fica desativado até ativar() ser chamado (opção --lotes); desativado, os loaders do
+generate_data mantêm o envio original (linha a linha no PostgreSQL e no Cassandra,
+um insert_many da coleção inteira no MongoDB).
+
+O ajuste é uma subida de encosta: a cada `janela` lotes mede a vazão (linhas/s) e a
+latência média por lote (por requisição, no Cassandra); enquanto a vazão melhora mais
+que 5% e a latência fica abaixo do limite, o parâmetro dobra. Quando para de melhorar,
+volta ao melhor valor visto e passa ao próximo parâmetro ou se fixa.
+
+- PostgreSQL: linhas por execute_values
+- MongoDB: documentos por insert_many
+- Cassandra: requisições simultâneas (execute_concurrent); o lote é só a unidade de
+  medição, já que batches com várias partições sobrecarregam o coordenador
+
+No modo 'auto' os valores escolhidos são gravados em resultados/lotes.json; o modo
+'salvos' os reaproveita (tabelas sem valor salvo são ajustadas).
+"""
+import json
+import os
+from datetime import datetime
+from time import perf_counter
+
+MODOS = ['auto', 'salvos']
+RAIZ = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+ARQUIVO_PADRAO = os.path.join(RAIZ, 'resultados', 'lotes.json')
+
+# Ponto de partida e parâmetros ajustados por backend
+INICIAL = {
+    'postgres': {'tamanho': 100, 'concorrencia': 1, 'parametros': ('tamanho',)},
+    'mongodb': {'tamanho': 100, 'concorrencia': 1, 'parametros': ('tamanho',)},
+    'cassandra': {'tamanho': 2000, 'concorrencia': 8, 'parametros': ('concorrencia',)},
+}
+MAXIMO = {'tamanho': 50000, 'concorrencia': 512}
+
+class AjusteLote:
+    def __init__(self, tamanho, concorrencia, parametros, latencia_max_s=2.0, janela=3, fixo=False):
+        self.tamanho = tamanho
+        self.concorrencia = concorrencia
+        self.parametros = list(parametros)
+        self.latencia_max_s = latencia_max_s
+        self.janela = janela
+        self.fixo = fixo
+        self.historico = []
+        self._amostras = []
+        self._melhor = None
+        self._linhas = 0
+        self._segundos = 0.0
+
+    def observar(self, linhas, segundos):
+        self._linhas += linhas
+        self._segundos += segundos
+        if self.fixo:
+            return
+        self._amostras.append((linhas, segundos))
+        if len(self._amostras) < self.janela:
+            return
+        linhas = sum(l for l, _ in self._amostras)
+        segundos = sum(s for _, s in self._amostras) or 1e-9
+        vazao = linhas / segundos
+        if self.parametros[0] == 'concorrencia':
+            # Latência estimada por requisição: cada vaga atende linhas/concorrencia requisições
+            latencia = segundos * self.concorrencia / linhas
+        else:
+            latencia = segundos / len(self._amostras)
+        self._amostras = []
+        self.historico.append({'tamanho': self.tamanho, 'concorrencia': self.concorrencia,
+                               'linhas_por_s': vazao, 'latencia_s': latencia})
+        if latencia > self.latencia_max_s:
+            if self._melhor is None and self.parametros[0] == 'tamanho' and self.tamanho > 1:
+                self.tamanho //= 2
+            else:
+                self._proximo_parametro()
+        elif self._melhor is None or vazao > self._melhor[0] * 1.05:
+            self._melhor = (vazao, self.tamanho, self.concorrencia)
+            self._crescer()
+        else:
+            self._proximo_parametro()
+
+    def _crescer(self):
+        parametro = self.parametros[0]
+        atual = getattr(self, parametro)
+        if atual >= MAXIMO[parametro]:
+            self._proximo_parametro()
+        else:
+            setattr(self, parametro, min(MAXIMO[parametro], atual * 2))
+
+    def _proximo_parametro(self):
+        if self._melhor is not None:
+            _, self.tamanho, self.concorrencia = self._melhor
+        self.parametros.pop(0)
+        if self.parametros:
+            self._crescer()
+        else:
+            self.fixo = True
+
+    def resumo(self):
+        return {'tamanho': self.tamanho, 'concorrencia': self.concorrencia,
+                'linhas_por_s': self._linhas / self._segundos if self._segundos else None,
+                'ajustes': len(self.historico)}
+
+_config = None
+
+def ativar(modo='auto', arquivo=ARQUIVO_PADRAO, latencia_max_s=2.0):
+    global _config
+    salvos = {}
+    if modo == 'salvos':
+        if os.path.exists(arquivo):
+            with open(arquivo) as f:
+                salvos = json.load(f)
+        else:
+            print(f"Lotes: {arquivo} não existe; todas as tabelas serão ajustadas")
+    _config = {'modo': modo, 'arquivo': arquivo, 'latencia_max_s': latencia_max_s, 'salvos': salvos,
+               'ajustes': {}}
+    return _config
+
+def ativo():
+    return _config is not None
+
+def ajuste(backend, tabela):
+    """Ajuste da tabela, criado na primeira carga (a partir do valor salvo, se houver)."""
+    chave = (backend, tabela)
+    if chave not in _config['ajustes']:
+        inicial = INICIAL[backend]
+        salvo = _config['salvos'].get(backend, {}).get(tabela)
+        if salvo:
+            _config['ajustes'][chave] = AjusteLote(salvo['tamanho'], salvo['concorrencia'], (), fixo=True)
+        else:
+            _config['ajustes'][chave] = AjusteLote(inicial['tamanho'], inicial['concorrencia'],
+                                                   inicial['parametros'], _config['latencia_max_s'])
+    return _config['ajustes'][chave]
+
+def carregar(backend, tabela, linhas, enviar):
+    """Envia `linhas` em lotes com `enviar(lote, concorrencia)`, ajustando o tamanho a cada lote."""
+    atual = ajuste(backend, tabela)
+    inicio = 0
+    while inicio < len(linhas):
+        lote = linhas[inicio:inicio + atual.tamanho]
+        antes = perf_counter()
+        enviar(lote, atual.concorrencia)
+        atual.observar(len(lote), perf_counter() - antes)
+        inicio += len(lote)
+
+def escolhidos(backend):
+    """Tabela -> valores finais do ajuste, para o registro CARGA."""
+    if _config is None:
+        return None
+    return {tabela: atual.resumo() for (b, tabela), atual in _config['ajustes'].items() if b == backend}
+
+def salvar():
+    """No modo 'auto', grava os valores escolhidos (mesclados aos já salvos)."""
+    if _config is None or _config['modo'] != 'auto' or not _config['ajustes']:
+        return
+    salvos = {}
+    if os.path.exists(_config['arquivo']):
+        with open(_config['arquivo']) as f:
+            salvos = json.load(f)
+    for (backend, tabela), atual in _config['ajustes'].items():
+        salvos.setdefault(backend, {})[tabela] = dict(atual.resumo(), data=datetime.now().isoformat())
+    os.makedirs(os.path.dirname(_config['arquivo']), exist_ok=True)
+    with open(_config['arquivo'], 'w') as f:
+        json.dump(salvos, f, indent=2, ensure_ascii=False)
+    print(f"Lotes escolhidos gravados em {_config['arquivo']}")
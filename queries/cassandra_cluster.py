@@ -0,0 +1,78 @@
+# cassandra_cluster.py
+"""
+Conexão com o Cassandra compartilhada pelos scripts: pontos de contato, roteamento
+token-aware (TokenAwarePolicy sobre DCAwareRoundRobinPolicy), compressão do protocolo
+e nível de consistência padrão das sessões. As opções valem para as sessões abertas
+depois de configurar() e podem vir da linha de comando (adicionar_opcoes_cassandra).
+
+O roteamento token-aware só escolhe a réplica quando o driver conhece a chave de
+partição, isto é, com statements preparados.
+
+Para o anel de 3 nós de docker-compose.cassandra-cluster.yml:
+--cassandra-contatos localhost:9042,localhost:9043,localhost:9044
+"""
+from cassandra import ConsistencyLevel
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.cluster import Cluster
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+
+NIVEIS_CONSISTENCIA = ['ONE', 'LOCAL_ONE', 'TWO', 'QUORUM', 'LOCAL_QUORUM', 'ALL']
+COMPRESSAO = {'auto': True, 'lz4': 'lz4', 'snappy': 'snappy', 'nenhuma': False}
+
+_config = {
+    'contatos': [('localhost', 9042)],
+    # None mantém o padrão do driver (LOCAL_ONE)
+    'consistencia': None,
+    'compressao': True,
+}
+
+def _contato(texto):
+    host, _, porta = texto.strip().partition(':')
+    return host, int(porta or 9042)
+
+def configurar(contatos=None, consistencia=None, compressao=None):
+    if contatos:
+        _config['contatos'] = [_contato(contato) for contato in contatos]
+    if consistencia is not None:
+        if consistencia not in NIVEIS_CONSISTENCIA:
+            raise ValueError(f"Nível de consistência desconhecido: {consistencia}")
+        _config['consistencia'] = consistencia
+    if compressao is not None:
+        _config['compressao'] = COMPRESSAO[compressao]
+
+def consistencia_atual():
+    return _config['consistencia'] or 'LOCAL_ONE'
+
+def criar_cluster():
+    return Cluster(
+        _config['contatos'],
+        auth_provider=PlainTextAuthProvider('cassandra', 'cassandra'),
+        load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+        compression=_config['compressao'],
+    )
+
+def conectar(keyspace='techmarket'):
+    """Abre cluster e sessão com a configuração atual; o chamador encerra os dois."""
+    cluster = criar_cluster()
+    session = cluster.connect(keyspace)
+    if _config['consistencia']:
+        session.default_consistency_level = getattr(ConsistencyLevel, _config['consistencia'])
+    return cluster, session
+
+# --- Linha de comando ---
+def adicionar_opcoes_cassandra(parser):
+    parser.add_argument('--cassandra-contatos', type=lambda texto: texto.split(','),
+                        help="Pontos de contato host[:porta], separados por vírgula (padrão: localhost:9042)")
+    parser.add_argument('--consistencias', type=lambda texto: [nivel.strip().upper() for nivel in texto.split(',')],
+                        help="Níveis de consistência a varrer, p.ex. ONE,QUORUM,ALL (padrão: o do driver)")
+    parser.add_argument('--compressao', choices=list(COMPRESSAO), default='auto',
+                        help="Compressão do protocolo nativo (auto usa lz4 ou snappy, se instalados)")
+    return parser
+
+def configurar_de_args(args):
+    """Aplica contatos e compressão; retorna os níveis de consistência a varrer ([None] = padrão)."""
+    configurar(contatos=args.cassandra_contatos, compressao=args.compressao)
+    for nivel in args.consistencias or []:
+        if nivel not in NIVEIS_CONSISTENCIA:
+            raise SystemExit(f"Nível de consistência desconhecido: {nivel}")
+    return args.consistencias or [None]
@@ -1,11 +1,22 @@
 import cassandra
-from cassandra.cluster import Cluster
-from cassandra.auth import PlainTextAuthProvider
-from cassandra.query import SimpleStatement
-import time
-from datetime import datetime, timedelta
+from cassandra.query import SimpleStatement, named_tuple_factory
+from cassandra.concurrent import execute_concurrent_with_args
+from collections import Counter
+import random
+import threading
+import result_cache
+import resource_sampler
+import client_profiler
+from time import perf_counter_ns
+from datetime import timedelta
 from decimal import Decimal
 import uuid 
+from cache_control import preparar_cache, preparar_bateria
+from cassandra_cluster import (conectar, consistencia_atual, configurar, adicionar_opcoes_cassandra,
+                               configurar_de_args)
+from harness import (criar_parser, adicionar_opcoes_amostragem, opcoes_consulta, novo_registro,
+                     finalizar, amostrar_estratificado, anotar_parametros, resumir_distribuicao)
+from timing import Cronometro, medir_stream, consumir_stream, fabrica_linhas_medida
 
 # --- Funções de Formatação ---
 def format_currency_br(valor: Decimal) -> str:
@@ -54,29 +65,125 @@ def format_total_gasto_cassandra(row_dict):
     total_formatado = format_currency_br(total)
     return f"Cliente: {nome} | Total gasto: {total_formatado}"
 
-def run_cassandra_query(description, query, params=None, formatter=None, keyspace='techmarket'):
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra') 
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect(keyspace) 
-    
-    start = time.time()
+def _micros(duracao):
+    return int(duracao.total_seconds() * 1000000) if duracao is not None else None
+
+def tracear(session, statement, params=None):
+    """
+    Executa a consulta de novo, fora da medição, com tracing ligado (o tracing grava
+    eventos em system_traces e inflaria o tempo medido); {'erro': ...} se o trace falhar
+    ou não ficar disponível a tempo.
+    """
+    try:
+        return resumir_trace(session.execute(statement, params, trace=True))
+    except Exception as e:
+        return {'erro': str(e)}
+
+def resumir_trace(rows):
+    """Converte o trace da requisição (tracing do Cassandra) em um dict serializável."""
+    trace = rows.get_query_trace(max_wait_sec=5)
+    if trace is None:
+        return None
+    return {
+        'coordenador': trace.coordinator,
+        'duracao_us': _micros(trace.duration),
+        'eventos': [
+            {'descricao': ev.description, 'origem': ev.source,
+             'decorrido_us': _micros(ev.source_elapsed), 'thread': ev.thread_name}
+            for ev in trace.events
+        ]
+    }
+
+class PaginasComPrefetch:
+    """
+    Itera as linhas página a página, pedindo a próxima página ao servidor
+    antes de entregar as linhas da página atual (prefetch assíncrono).
+    """
+
+    def __init__(self, session, query, params=None, fetch_size=None):
+        if isinstance(query, str):
+            query = SimpleStatement(query, fetch_size=fetch_size)
+        elif fetch_size:
+            query.fetch_size = fetch_size
+        self.future = session.execute_async(query, params)
+
+    def __iter__(self):
+        while True:
+            linhas = self.future.result().current_rows
+            tem_mais = self.future.has_more_pages
+            if tem_mais:
+                self.future.start_fetching_next_page()
+            yield from linhas
+            if not tem_mais:
+                return
+
+def run_cassandra_query(description, query, params=None, formatter=None, keyspace='techmarket',
+                        capturar_plano=False, imprimir=True, modo_cache='padrao', fetch_size=None,
+                        pos_processar=None):
+    """
+    `pos_processar` recebe o iterável de linhas e devolve a lista a ser exibida
+    (filtros e agregações feitos no cliente); roda dentro do intervalo medido.
+
+    Fases medidas: espera pela primeira página (servidor), pelas seguintes
+    (transferencia) e a row_factory executada na thread de IO do driver
+    (decodificacao, descontada das esperas). Todas as páginas são consumidas
+    antes de parar o cronômetro.
+    """
+    inicio_ns = perf_counter_ns()
+    chave_cache, em_cache = result_cache.buscar('cassandra', description, query, params)
+    if em_cache is not None:
+        return result_cache.servir_do_cache('cassandra', description, em_cache, inicio_ns, formatter,
+                                            imprimir, modo_cache)
+    preparar_cache('cassandra', modo_cache)
+    cluster, session = conectar(keyspace)
     
     try:
-        if params:
-            rows = session.execute(query, params)
+        # Preparado fora da medição: com a chave de partição conhecida o driver envia
+        # a requisição direto a uma réplica (roteamento token-aware)
+        statement = session.prepare(query.replace('%s', '?')) if params else query
+        cronometro = Cronometro()
+        session.row_factory = fabrica_linhas_medida(cronometro, named_tuple_factory)
+        if fetch_size:
+            rows = PaginasComPrefetch(session, statement, params, fetch_size)
+            fases = {}
         else:
-            rows = session.execute(query)
-            
-        end = time.time()
-        
-        print(f"{description} - Tempo: {end - start:.4f} s")
-        results_found = False
-        for row in rows:
-            print(formatter(row) if formatter else row)
-            results_found = True
+            with cronometro.medir('servidor'):
+                rows = session.execute(statement, params)
+            # Primeira página já recebida; as demais são buscadas durante a iteração
+            fases = {'fase_primeira': 'transferencia'}
+        if pos_processar:
+            resultados = pos_processar(medir_stream(rows, cronometro, **fases))
+        else:
+            resultados = consumir_stream(rows, cronometro, guardar=imprimir, **fases)
+        cronometro.parar()
         
-        if not results_found:
-            print("Nenhum resultado encontrado.")
+        print(f"{description} - Tempo: {cronometro.tempo_s:.4f} s")
+        registro = novo_registro('cassandra', description, cronometro.tempo_s, modo_cache=modo_cache,
+                                 consistencia=consistencia_atual(), **cronometro.registro())
+        if pos_processar:
+            registro.update(linhas_lidas=registro['linhas'], linhas=len(resultados))
+        if chave_cache is not None:
+            registro['cache'] = 'miss'
+            if imprimir or pos_processar or not fetch_size:
+                result_cache.guardar(chave_cache, 'cassandra', result_cache.tabelas_sql(query), resultados,
+                                     cronometro.tempo_s)
+        if fetch_size:
+            registro['fetch_size'] = fetch_size
+            print(f"Primeira linha: {registro['tempo_primeira_linha_s'] or 0:.4f} s | "
+                  f"Última linha: {cronometro.tempo_s:.4f} s | Linhas: {registro['linhas']}")
+        if capturar_plano:
+            # Sem a row_factory medida: a execução com tracing não entra nas fases
+            session.row_factory = named_tuple_factory
+            registro['trace'] = tracear(session, statement, params)
+        with cronometro.medir('formatacao'):
+            if imprimir:
+                if not resultados:
+                    print("Nenhum resultado encontrado.")
+                for row in resultados:
+                    print(formatter(row) if formatter else row)
+        registro['fases_ms'] = cronometro.registro()['fases_ms']
+        print(f"Fases: {cronometro.resumo()}")
+        return registro
             
     except Exception as e:
         print(f"Erro ao executar a consulta '{description}': {e}")
@@ -84,11 +191,51 @@ def run_cassandra_query(description, query, params=None, formatter=None, keyspac
         session.shutdown()
         cluster.shutdown()
 
+def run_top_produtos(description, limite=5, capturar_plano=False, imprimir=True, modo_cache='padrao',
+                     fetch_size=None):
+    """
+    Q4 via varredura por faixas de token (top_produtos_mais_vendidos). A varredura
+    dispara dezenas de requisições, então o tracing delas não é coletado.
+    """
+    inicio_ns = perf_counter_ns()
+    chave_cache, em_cache = result_cache.buscar('cassandra', description, 'top_produtos_mais_vendidos', [limite])
+    if em_cache is not None:
+        return result_cache.servir_do_cache('cassandra', description, em_cache, inicio_ns,
+                                            format_mais_vendido_cassandra, imprimir, modo_cache)
+    preparar_cache('cassandra', modo_cache)
+    cluster, session = conectar()
+    
+    try:
+        cronometro = Cronometro()
+        with cronometro.medir('servidor'):
+            sorted_vendas = top_produtos_mais_vendidos(session, limite=limite, fetch_size=fetch_size or 1000)
+        cronometro.marcar_linhas(len(sorted_vendas))
+        cronometro.parar()
+        print(f"{description} - Tempo: {cronometro.tempo_s:.4f} s")
+        registro = novo_registro('cassandra', description, cronometro.tempo_s,
+                                 modo_cache=modo_cache, consistencia=consistencia_atual(), **cronometro.registro())
+        if chave_cache is not None:
+            registro['cache'] = 'miss'
+            result_cache.guardar(chave_cache, 'cassandra', ['pedido_por_cliente', 'produto'], sorted_vendas,
+                                 cronometro.tempo_s)
+        with cronometro.medir('formatacao'):
+            if imprimir:
+                if not sorted_vendas:
+                    print("Nenhum resultado encontrado.")
+                for item in sorted_vendas:
+                    print(format_mais_vendido_cassandra(item))
+        registro['fases_ms'] = cronometro.registro()['fases_ms']
+        return registro
+            
+    except Exception as e:
+        print(f"Erro ao executar Q4: {e}")
+    finally:
+        session.shutdown()
+        cluster.shutdown()
+
 def find_cliente_with_status(status_alvo='entregue'):
     """Busca um cliente que tenha pedidos com o status especificado."""
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
+    cluster, session = conectar()
     
     try:
         # Busca todos os pedidos e filtra por status
@@ -124,9 +271,7 @@ def find_cliente_with_status(status_alvo='entregue'):
 
 def get_first_cliente_id():
     """Busca o primeiro cliente disponível no banco"""
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
+    cluster, session = conectar()
     
     try:
         rows = session.execute("SELECT id, email FROM cliente LIMIT 1")
@@ -142,9 +287,7 @@ def get_first_cliente_id():
 
 def check_available_status():
     """Verifica quais status estão disponíveis no banco"""
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
+    cluster, session = conectar()
     
     try:
         rows = session.execute("SELECT status FROM pedido_por_cliente LIMIT 50 ALLOW FILTERING")
@@ -164,210 +307,365 @@ def check_available_status():
         session.shutdown()
         cluster.shutdown()
 
-if __name__ == "__main__":
-    
-    # Primeiro, vamos verificar quais status existem
-    print("\nVerificando status disponíveis...")
-    available_status = check_available_status()
-    
-    # Buscar um cliente dinamicamente que tenha pedidos 'entregue'
-    print("\nBuscando primeiro cliente com pedidos entregues...")
-    id_cliente_alvo, email_cliente = find_cliente_with_status('entregue')
-    
-    if not id_cliente_alvo:
-        print("Nenhum cliente encontrado com pedidos entregues no banco de dados.")
-        
-        # Tenta com outros status se 'entregue' não existir
-        if 'enviado' in available_status:
-            print("Tentando buscar cliente com pedidos 'enviado'...")
-            id_cliente_alvo, email_cliente = find_cliente_with_status('enviado')
-        
-        if not id_cliente_alvo:
-            print("Buscando qualquer cliente disponível...")
-            id_cliente_alvo, email_cliente = get_first_cliente_id()
-            
-            if not id_cliente_alvo:
-                print("Nenhum cliente encontrado no banco de dados.")
-                exit()
-    
-    print(f"Cliente encontrado: {email_cliente} (ID: {id_cliente_alvo})")
-    
-    # Q1 - Últimos 3 pedidos do cliente encontrado
-    run_cassandra_query("\nQ1 - Últimos 3 pedidos do cliente",
-                        """
-                        SELECT id_pedido, id_cliente, data_pedido, status, valor_total
-                        FROM pedido_por_cliente
-                        WHERE id_cliente = %s
-                        LIMIT 3
-                        """,
-                        (id_cliente_alvo,), formatter=format_row_pedido)
-    
-    # Q2 - Produtos da categoria Monitores (ou primeira categoria disponível)
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
+# --- Varredura paralela por faixas de token ---
+# Limites do anel de tokens do Murmur3Partitioner (particionador padrão)
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+def dividir_token_ring(num_faixas):
+    """Divide o anel de tokens em faixas contíguas no formato (inicio, fim]."""
+    passo = (MAX_TOKEN - MIN_TOKEN) // num_faixas
+    faixas = []
+    inicio = MIN_TOKEN
+    for i in range(num_faixas):
+        fim = MAX_TOKEN if i == num_faixas - 1 else inicio + passo
+        faixas.append((inicio, fim))
+        inicio = fim
+    return faixas
+
+class _ScanFaixa:
+    """Consome todas as páginas de uma faixa de tokens via callbacks do driver."""
+
+    def __init__(self, session, statement, faixa, processar_linha, ao_terminar):
+        self.processar_linha = processar_linha
+        self.ao_terminar = ao_terminar
+        self.future = session.execute_async(statement, faixa)
+        self.future.add_callbacks(callback=self._pagina, errback=self._erro)
+
+    def _pagina(self, rows):
+        try:
+            for row in rows:
+                self.processar_linha(row)
+        except Exception as e:
+            self.ao_terminar(e)
+            return
+        if self.future.has_more_pages:
+            self.future.start_fetching_next_page()
+        else:
+            self.ao_terminar(None)
+
+    def _erro(self, exc):
+        self.ao_terminar(exc)
+
+def scan_token_ranges(session, tabela, chave_particao, colunas, criar_acumulador, agregar,
+                      num_faixas=64, concorrencia=8, fetch_size=1000):
+    """
+    Varre a tabela inteira dividindo o anel de tokens em faixas, com até `concorrencia`
+    faixas em voo ao mesmo tempo e paginação de `fetch_size` linhas.
+    Cada faixa agrega em seu próprio acumulador (sem locks nos callbacks);
+    retorna a lista de acumuladores para o chamador combinar.
+    """
+    statement = session.prepare(
+        f"SELECT {colunas} FROM {tabela} "
+        f"WHERE token({chave_particao}) > ? AND token({chave_particao}) <= ?"
+    )
+    statement.fetch_size = fetch_size
+
+    faixas = dividir_token_ring(num_faixas)
+    acumuladores = [criar_acumulador() for _ in faixas]
+    vagas = threading.Semaphore(concorrencia)
+    lock = threading.Lock()
+    terminou = threading.Event()
+    erros = []
+    restantes = [len(faixas)]
+
+    def ao_terminar(exc):
+        with lock:
+            if exc is not None:
+                erros.append(exc)
+            restantes[0] -= 1
+            if restantes[0] == 0:
+                terminou.set()
+        vagas.release()
+
+    for faixa, acumulador in zip(faixas, acumuladores):
+        vagas.acquire()
+        _ScanFaixa(session, statement, faixa,
+                   lambda row, acumulador=acumulador: agregar(acumulador, row),
+                   ao_terminar)
+
+    terminou.wait()
+    if erros:
+        raise erros[0]
+    return acumuladores
+
+def resolver_nomes_produtos(session, ids_produto, concorrencia=32):
+    """Busca os nomes dos produtos com consultas preparadas executadas em paralelo."""
+    select_nome = session.prepare("SELECT id, nome FROM produto WHERE id = ?")
+    resultados = execute_concurrent_with_args(
+        session, select_nome, [(id_produto,) for id_produto in ids_produto],
+        concurrency=concorrencia, raise_on_first_error=False
+    )
+    nomes = {}
+    for sucesso, rows in resultados:
+        if not sucesso:
+            continue
+        row = rows.one()
+        if row:
+            nomes[row.id] = row.nome
+    return nomes
+
+def _somar_itens(vendas, row):
+    if row.itens:
+        vendas.update(row.itens)
+
+def top_produtos_mais_vendidos(session, limite=5, num_faixas=64, concorrencia=8, fetch_size=1000):
+    """
+    Q4 completo: soma as quantidades de todos os pedidos de pedido_por_cliente
+    (varredura por faixas de token) e resolve os nomes apenas dos candidatos ao top N.
+    """
+    parciais = scan_token_ranges(session, 'pedido_por_cliente', 'id_cliente', 'itens',
+                                 Counter, _somar_itens, num_faixas=num_faixas,
+                                 concorrencia=concorrencia, fetch_size=fetch_size)
+    vendas_por_produto_id = Counter()
+    for parcial in parciais:
+        vendas_por_produto_id.update(parcial)
+
+    # Produtos sem nome (removidos da tabela produto) são ignorados, então buscamos
+    # candidatos em blocos até completar o top N
+    ranking = vendas_por_produto_id.most_common()
+    top = []
+    for inicio in range(0, len(ranking), limite):
+        bloco = ranking[inicio:inicio + limite]
+        nomes = resolver_nomes_produtos(session, [prod_id for prod_id, _ in bloco])
+        for prod_id, total_vendido in bloco:
+            if prod_id in nomes:
+                top.append({'nome_produto': nomes[prod_id], 'total_vendido': total_vendido})
+        if len(top) >= limite:
+            break
+    return top[:limite]
+
+def get_first_categoria():
+    """Busca a primeira categoria disponível no banco"""
+    cluster, session = conectar()
     
     try:
-        # Buscar primeira categoria disponível
-        categoria_rows = session.execute("SELECT DISTINCT categoria FROM produto_por_categoria LIMIT 1")
-        categoria_alvo = None
-        for row in categoria_rows:
-            categoria_alvo = row.categoria
-            break
-            
-        if categoria_alvo:
-            print(f"\nUsando categoria: {categoria_alvo}")
-            start_q2 = time.time()
-            q2_rows = session.execute(
-                """
-                SELECT id, nome, categoria, preco, estoque
-                FROM produto_por_categoria
-                WHERE categoria = %s
-                LIMIT 5
-                """,
-                (categoria_alvo,)
-            )
-            end_q2 = time.time()
-            
-            print(f"Q2 - Produtos da categoria ordenados por preço - Tempo: {end_q2 - start_q2:.4f} s")
-            results_found = False
-            for row in q2_rows:
-                print(format_produto_cassandra(row))
-                results_found = True
-            
-            if not results_found:
-                print("Nenhum resultado encontrado.")
-        else:
-            print("Nenhuma categoria encontrada.")
-            
+        rows = session.execute("SELECT DISTINCT categoria FROM produto_por_categoria LIMIT 1")
+        for row in rows:
+            return row.categoria
+        return None
     except Exception as e:
-        print(f"Erro ao executar Q2: {e}")
+        print(f"Erro ao buscar categoria: {e}")
+        return None
     finally:
         session.shutdown()
         cluster.shutdown()
-    
-    # Q3 - Pedidos entregues do cliente (ou com status disponível)
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
+
+def _contar_cliente(contagem, row):
+    contagem[row.id_cliente] += 1
+
+def sample_clientes(n, estrato='todos', rng=random):
+    """
+    Sorteia clientes com pedidos, opcionalmente estratificados pelo número de pedidos.
+    A contagem vem de uma varredura por faixas de token de pedido_por_cliente.
+    """
+    cluster, session = conectar()
     
     try:
-        start_q3 = time.time()
-        
-        # Determina qual status usar para o Q3
-        status_para_q3 = 'entregue' if 'entregue' in available_status else ('enviado' if 'enviado' in available_status else list(available_status)[0] if available_status else 'entregue')
-        
-        q3_query = """
-            SELECT id_pedido, id_cliente, data_pedido, status, valor_total
-            FROM pedido_por_cliente
-            WHERE id_cliente = %s
-            LIMIT 10
-        """
-        print(f"Executando Q3 para cliente: {id_cliente_alvo}, buscando status: {status_para_q3}")
-        q3_rows = session.execute(q3_query, (id_cliente_alvo,))
-        
-        q3_results = []
-        for row in q3_rows:
-            if row.status == status_para_q3:
-                print(f"Pedido encontrado: {row.id_pedido}, Status: {row.status}")
-                q3_results.append(row)
-                
-        end_q3 = time.time()
-        print(f"\nQ3 - Pedidos com status '{status_para_q3}' do cliente - Tempo: {end_q3 - start_q3:.4f} s")
-        if not q3_results:
-            print("Nenhum resultado encontrado.")
-        for row in q3_results:
-            print(format_row_pedido(row))
-    except Exception as e:
-        print(f"Erro ao executar Q3: {e}")
+        parciais = scan_token_ranges(session, 'pedido_por_cliente', 'id_cliente', 'id_cliente',
+                                     Counter, _contar_cliente)
+        pedidos_por_cliente = Counter()
+        for parcial in parciais:
+            pedidos_por_cliente.update(parcial)
+        amostra = amostrar_estratificado(list(pedidos_por_cliente.items()), n, estrato, rng)
+
+        select_email = session.prepare("SELECT id, email FROM cliente WHERE id = ?")
+        emails = {}
+        for sucesso, rows in execute_concurrent_with_args(
+                session, select_email, [(id_cliente,) for id_cliente, _ in amostra],
+                raise_on_first_error=False):
+            row = rows.one() if sucesso else None
+            if row:
+                emails[row.id] = row.email
+        return [((id_cliente, emails.get(id_cliente)), total) for id_cliente, total in amostra]
     finally:
         session.shutdown()
         cluster.shutdown()
- 
-    # Q4 - Top 5 produtos mais vendidos
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
+
+def sample_categorias(n, estrato='todas', rng=random):
+    """Sorteia categorias, opcionalmente estratificadas pelo número de produtos."""
+    cluster, session = conectar()
     
     try:
-        start_q4 = time.time()
-        all_pedidos = session.execute("SELECT itens FROM pedido_por_cliente LIMIT 100 ALLOW FILTERING;") 
-        vendas_por_produto_id = {}
-        for pedido_row in all_pedidos:
-            if pedido_row.itens: 
-                for id_prod, quantidade in pedido_row.itens.items():
-                    vendas_por_produto_id[id_prod] = vendas_por_produto_id.get(id_prod, 0) + quantidade
-        
-        produto_nomes = {}
-        if vendas_por_produto_id:
-            for prod_id in vendas_por_produto_id.keys():
-                try:
-                    prod_row = session.execute("SELECT nome FROM produto WHERE id = %s", (prod_id,)).one()
-                    if prod_row:
-                        produto_nomes[prod_id] = prod_row.nome
-                except:
-                    continue
-        
-        final_vendas = []
-        for prod_id, total_vendido in vendas_por_produto_id.items():
-            if prod_id in produto_nomes:
-                final_vendas.append({'nome_produto': produto_nomes[prod_id], 'total_vendido': total_vendido})
-        
-        sorted_vendas = sorted(final_vendas, key=lambda item: item['total_vendido'], reverse=True)[:5]
-        
-        end_q4 = time.time()
-        print(f"\nQ4 - Top 5 produtos mais vendidos - Tempo: {end_q4 - start_q4:.4f} s")
-        if not sorted_vendas:
-            print("Nenhum resultado encontrado.")
-        for item in sorted_vendas:
-            print(format_mais_vendido_cassandra(item))
-            
-    except Exception as e:
-        print(f"Erro ao executar Q4: {e}")
+        categorias = [row.categoria for row in session.execute("SELECT DISTINCT categoria FROM produto_por_categoria")]
+        contagens = []
+        for categoria in categorias:
+            total = session.execute("SELECT COUNT(*) FROM produto_por_categoria WHERE categoria = %s",
+                                    (categoria,)).one()[0]
+            contagens.append((categoria, total))
+        return amostrar_estratificado(contagens, n, estrato, rng)
     finally:
         session.shutdown()
         cluster.shutdown()
 
-    # Q5 - Pagamentos via PIX no último mês
-    um_mes_atras = datetime.now() - timedelta(days=30)
-    
-    run_cassandra_query("\nQ5 - Pagamentos via PIX no último mês",
-                        """
-                        SELECT id, id_pedido, tipo, status, data_pagamento
-                        FROM pagamento_por_tipo_data
-                        WHERE tipo = %s AND data_pagamento >= %s
-                        ORDER BY data_pagamento DESC
-                        LIMIT 5;
-                        """,
-                        ('pix', um_mes_atras), formatter=format_pagamento_cassandra)
-    
-    # Q6 - Total gasto pelo cliente nos últimos 3 meses
-    auth_provider = PlainTextAuthProvider('cassandra', 'cassandra')
-    cluster = Cluster(['localhost'], auth_provider=auth_provider)
-    session = cluster.connect('techmarket')
-    
-    try:
-        start_q6 = time.time()
-        tres_meses_atras = datetime.now() - timedelta(days=90)
+# Marca a Q4, executada pela varredura por faixas de token e não por uma única CQL
+TOP_PRODUTOS = 'top_produtos_mais_vendidos'
+
+def consultas(id_cliente_alvo, email_cliente, categoria_alvo, status_para_q3='entregue'):
+    """
+    Definição de Q1-Q6: lista de (descrição, CQL, parâmetros, formatter, pos_processar).
+    A Q4 usa TOP_PRODUTOS no lugar da CQL; a Q2 é omitida sem categoria.
+    """
+    agora = result_cache.referencia()
+    um_mes_atras = agora - timedelta(days=30)
+    tres_meses_atras = agora - timedelta(days=90)
+
+    def total_gasto(rows):
+        total = sum((row.valor_total for row in rows), Decimal('0.00'))
+        return [{'cliente_nome': email_cliente, 'total_gasto': total}]
+
+    definicoes = [
+        # Q1 - Últimos 3 pedidos do cliente encontrado
+        ("\nQ1 - Últimos 3 pedidos do cliente",
+         """
+         SELECT id_pedido, id_cliente, data_pedido, status, valor_total
+         FROM pedido_por_cliente
+         WHERE id_cliente = %s
+         LIMIT 3
+         """,
+         (id_cliente_alvo,), format_row_pedido, None),
+
+        # Q2 - Produtos da categoria
+        ("\nQ2 - Produtos da categoria ordenados por preço",
+         """
+         SELECT id, nome, categoria, preco, estoque
+         FROM produto_por_categoria
+         WHERE categoria = %s
+         LIMIT 5
+         """,
+         (categoria_alvo,), format_produto_cassandra, None),
+
+        # Q3 - Pedidos entregues do cliente (ou com status disponível), filtrados no cliente
+        (f"\nQ3 - Pedidos com status '{status_para_q3}' do cliente",
+         """
+         SELECT id_pedido, id_cliente, data_pedido, status, valor_total
+         FROM pedido_por_cliente
+         WHERE id_cliente = %s
+         LIMIT 10
+         """,
+         (id_cliente_alvo,), format_row_pedido,
+         lambda rows: [row for row in rows if row.status == status_para_q3]),
+
+        # Q4 - Top 5 produtos mais vendidos
+        ("\nQ4 - Top 5 produtos mais vendidos", TOP_PRODUTOS, (5,), format_mais_vendido_cassandra, None),
+
+        # Q5 - Pagamentos via PIX no último mês
+        ("\nQ5 - Pagamentos via PIX no último mês",
+         """
+         SELECT id, id_pedido, tipo, status, data_pagamento
+         FROM pagamento_por_tipo_data
+         WHERE tipo = %s AND data_pagamento >= %s
+         ORDER BY data_pagamento DESC
+         LIMIT 5;
+         """,
+         ('pix', um_mes_atras), format_pagamento_cassandra, None),
+
+        # Q6 - Total gasto pelo cliente nos últimos 3 meses
+        ("\nQ6 - Total gasto pelo cliente nos últimos 3 meses",
+         """
+         SELECT valor_total
+         FROM pedido_por_cliente
+         WHERE id_cliente = %s AND data_pedido >= %s
+         LIMIT 5
+         ALLOW FILTERING
+         """,
+         (id_cliente_alvo, tres_meses_atras), format_total_gasto_cassandra, total_gasto),
+    ]
+    if not categoria_alvo:
+        print("Nenhuma categoria encontrada.")
+        definicoes.pop(1)
+    return definicoes
+
+def executar_consultas(id_cliente_alvo, email_cliente, categoria_alvo, status_para_q3='entregue', **opcoes):
+    """
+    Executa Q1-Q6 para o cliente e a categoria informados e retorna os registros.
+    `opcoes` são repassadas a run_cassandra_query (capturar_plano, imprimir, modo_cache, fetch_size).
+    """
+    if opcoes.get('imprimir', True):
+        print(f"\nUsando categoria: {categoria_alvo} | status para Q3: {status_para_q3}")
+    resultados = []
+    for descricao, cql, params, formatter, pos_processar in consultas(id_cliente_alvo, email_cliente,
+                                                                      categoria_alvo, status_para_q3):
+        if cql == TOP_PRODUTOS:
+            resultados.append(resource_sampler.medir_registro('cassandra', run_top_produtos, descricao, *params,
+                                                              **opcoes))
+        else:
+            resultados.append(resource_sampler.medir_registro('cassandra', run_cassandra_query, descricao, cql,
+                                                              params, formatter=formatter,
+                                                              pos_processar=pos_processar, **opcoes))
+    return resultados
+
+if __name__ == "__main__":
+    parser = adicionar_opcoes_cassandra(adicionar_opcoes_amostragem(criar_parser("Consultas Q1-Q6 no Cassandra")))
+    args = parser.parse_args()
+    consistencias = configurar_de_args(args)
+    resultados = []
+    if args.cache_resultados:
+        result_cache.ativar(args.cache_capacidade, args.cache_ttl)
+    if args.recursos:
+        resource_sampler.ativar(args.recursos_intervalo)
+    client_profiler.ativar_de_args(args)
+
+    if args.amostras:
+        rng = random.Random(args.semente)
+        clientes = sample_clientes(args.amostras, args.estrato_clientes, rng)
+        categorias = sample_categorias(args.amostras, args.estrato_categorias, rng)
+        for nivel in consistencias:
+            configurar(consistencia=nivel)
+            preparar_bateria('cassandra', args.modo_cache)
+            registros_nivel = []
+            for ((id_cliente, email_cliente), pedidos_cliente), (categoria, produtos_categoria) in zip(clientes, categorias):
+                print(f"\nCliente: {email_cliente} (ID: {id_cliente}, {pedidos_cliente} pedidos) | "
+                      f"Categoria: {categoria} ({produtos_categoria} produtos) | Consistência: {consistencia_atual()}")
+                registros = executar_consultas(id_cliente, email_cliente, categoria,
+                                               **opcoes_consulta(args, imprimir=False))
+                registros_nivel.extend(anotar_parametros(registros, cliente=email_cliente,
+                                                         pedidos_cliente=pedidos_cliente, categoria=categoria,
+                                                         produtos_categoria=produtos_categoria))
+            sufixo = f" - consistência {consistencia_atual()}" if len(consistencias) > 1 else ""
+            resumir_distribuicao(registros_nivel, titulo=f"Tempo até a última linha{sufixo}")
+            if args.fetch_size:
+                resumir_distribuicao(registros_nivel, campo='tempo_primeira_linha_s',
+                                     titulo=f"Tempo até a primeira linha{sufixo}")
+            resultados.extend(registros_nivel)
+    else:
+        # Primeiro, vamos verificar quais status existem
+        print("\nVerificando status disponíveis...")
+        available_status = check_available_status()
         
-        q6_query = """
-                   SELECT valor_total
-                   FROM pedido_por_cliente
-                   WHERE id_cliente = %s AND data_pedido >= %s
-                   LIMIT 5
-                   ALLOW FILTERING
-                   """
-        q6_rows = session.execute(q6_query, (id_cliente_alvo, tres_meses_atras))
+        # Buscar um cliente dinamicamente que tenha pedidos 'entregue'
+        print("\nBuscando primeiro cliente com pedidos entregues...")
+        id_cliente_alvo, email_cliente = find_cliente_with_status('entregue')
         
-        total_gasto = Decimal('0.00')
-        for row in q6_rows:
-            total_gasto += row.valor_total
+        if not id_cliente_alvo:
+            print("Nenhum cliente encontrado com pedidos entregues no banco de dados.")
             
-        end_q6 = time.time()
-        print(f"\nQ6 - Total gasto pelo cliente nos últimos 3 meses - Tempo: {end_q6 - start_q6:.4f} s")
-        print(format_total_gasto_cassandra({'cliente_nome': email_cliente, 'total_gasto': total_gasto}))
-    except Exception as e:
-        print(f"Erro ao executar Q6: {e}")
-    finally:
-        session.shutdown()
-        cluster.shutdown()
\ No newline at end of file
+            # Tenta com outros status se 'entregue' não existir
+            if 'enviado' in available_status:
+                print("Tentando buscar cliente com pedidos 'enviado'...")
+                id_cliente_alvo, email_cliente = find_cliente_with_status('enviado')
+            
+            if not id_cliente_alvo:
+                print("Buscando qualquer cliente disponível...")
+                id_cliente_alvo, email_cliente = get_first_cliente_id()
+                
+                if not id_cliente_alvo:
+                    print("Nenhum cliente encontrado no banco de dados.")
+                    exit()
+        
+        print(f"Cliente encontrado: {email_cliente} (ID: {id_cliente_alvo})")
+        
+        # Determina qual status usar para o Q3
+        status_para_q3 = 'entregue' if 'entregue' in available_status else ('enviado' if 'enviado' in available_status else list(available_status)[0] if available_status else 'entregue')
+        
+        categoria_alvo = get_first_categoria()
+        for nivel in consistencias:
+            configurar(consistencia=nivel)
+            print(f"\nConsistência: {consistencia_atual()}")
+            preparar_bateria('cassandra', args.modo_cache)
+            resultados.extend(executar_consultas(id_cliente_alvo, email_cliente, categoria_alvo, status_para_q3,
+                                                 **opcoes_consulta(args)))
+
+    if args.cache_resultados:
+        result_cache.relatorio()
+    finalizar(resultados, args)
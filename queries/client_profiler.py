@@ -0,0 +1,236 @@
+# client_profiler.py
+"""
+Perfil do lado do cliente (Python) por fase, para separar gargalos do cliente dos do
+banco. Fica desativado até ativar() ser chamado (opção --perfil-cliente):
+
+- deterministico: cProfile por fase; grava <fase>.prof (pstats, abre no snakeviz) e
+  <fase>.txt com as funções de maior tempo próprio. Custo alto: os tempos medidos
+  durante o perfil ficam inflados e só servem para comparar fases entre si.
+- amostragem: uma thread lê as pilhas de todas as threads a cada `intervalo_s`;
+  grava <fase>.folded (pilhas colapsadas, entrada do flamegraph.pl/speedscope),
+  <fase>.svg (flame graph) e <fase>.txt. Custo baixo, inclui a thread de IO do driver
+  do Cassandra.
+
+As fases se aninham ('postgres' > 'postgres.decodificacao'); cada uma guarda só o
+tempo fora das fases internas. Só a thread que chamou ativar() abre fases.
+"""
+import cProfile
+import hashlib
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from html import escape
+
+MODOS = ['deterministico', 'amostragem']
+RAIZ = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+DIRETORIO_PADRAO = os.path.join(RAIZ, 'perfis')
+# Topo de pilha de threads auxiliares paradas esperando trabalho ou rede
+FUNCOES_OCIOSAS = {'wait', 'select', 'poll', 'epoll', 'get', 'accept', '_wait_for_tstate_lock', 'sleep'}
+
+class PerfilDeterministico:
+    def __init__(self):
+        self.perfis = {}
+
+    def entrar(self, nome):
+        self.perfis.setdefault(nome, cProfile.Profile()).enable()
+
+    def sair(self, nome):
+        self.perfis[nome].disable()
+
+    def gravar(self, diretorio):
+        for nome, perfil in self.perfis.items():
+            base = os.path.join(diretorio, nome)
+            perfil.dump_stats(base + '.prof')
+            texto = io.StringIO()
+            pstats.Stats(perfil, stream=texto).sort_stats('tottime').print_stats(25)
+            with open(base + '.txt', 'w') as f:
+                f.write(texto.getvalue())
+
+    def resumo(self):
+        """fase -> (segundos, [(função, segundos próprios)])."""
+        resumo = {}
+        for nome, perfil in self.perfis.items():
+            estatisticas = pstats.Stats(perfil).stats
+            proprio = Counter({f"{os.path.basename(arquivo)}:{funcao}": tt
+                               for (arquivo, _, funcao), (_, _, tt, _, _) in estatisticas.items()})
+            resumo[nome] = (sum(proprio.values()), proprio.most_common(5))
+        return resumo
+
+class PerfilAmostragem:
+    def __init__(self, intervalo_s):
+        self.intervalo_s = intervalo_s
+        self.pilhas = {}
+        self.duracao_s = Counter()
+        self.fase_atual = None
+        self._inicio = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+
+    def entrar(self, nome):
+        self._inicio = time.perf_counter()
+        self.fase_atual = nome
+
+    def sair(self, nome):
+        self.fase_atual = None
+        self.duracao_s[nome] += time.perf_counter() - self._inicio
+
+    def _amostrar(self):
+        proprio = threading.get_ident()
+        nomes = {}
+        while not self._parar.wait(self.intervalo_s):
+            fase = self.fase_atual
+            if fase is None:
+                continue
+            contagem = self.pilhas.setdefault(fase, Counter())
+            for ident, frame in sys._current_frames().items():
+                if ident == proprio:
+                    continue
+                if ident not in nomes:
+                    nomes = {t.ident: t.name for t in threading.enumerate()}
+                principal = ident == threading.main_thread().ident
+                if not principal and frame.f_code.co_name in FUNCOES_OCIOSAS:
+                    continue
+                quadros = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    quadros.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                quadros.append(f"thread:{nomes.get(ident, ident)}")
+                contagem[';'.join(reversed(quadros))] += 1
+
+    def encerrar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def gravar(self, diretorio):
+        self.encerrar()
+        for nome, contagem in self.pilhas.items():
+            base = os.path.join(diretorio, nome)
+            with open(base + '.folded', 'w') as f:
+                f.writelines(f"{pilha} {total}\n" for pilha, total in contagem.items())
+            with open(base + '.svg', 'w') as f:
+                f.write(flame_graph_svg(contagem, titulo=nome))
+            _, funcoes = self._resumo_fase(contagem, 25)
+            with open(base + '.txt', 'w') as f:
+                f.write(f"{sum(contagem.values())} amostras (intervalo de {self.intervalo_s * 1000:g} ms) "
+                        f"em {self.duracao_s[nome]:.3f} s\n\n")
+                f.writelines(f"{amostras:>8}  {funcao}\n" for funcao, amostras in funcoes)
+
+    def _resumo_fase(self, contagem, quantidade):
+        proprio = Counter()
+        for pilha, total in contagem.items():
+            proprio[pilha.rsplit(';', 1)[-1]] += total
+        return sum(contagem.values()), proprio.most_common(quantidade)
+
+    def resumo(self):
+        # A thread de amostragem disputa o GIL e perde amostras; o tempo de cada função é
+        # a fração das amostras aplicada à duração medida da fase
+        resumo = {}
+        for nome, contagem in self.pilhas.items():
+            amostras, funcoes = self._resumo_fase(contagem, 5)
+            duracao = self.duracao_s[nome]
+            resumo[nome] = (duracao, [(funcao, duracao * total / amostras) for funcao, total in funcoes])
+        return resumo
+
+def flame_graph_svg(contagem, titulo='', largura=1200, altura_linha=16):
+    """Flame graph em SVG a partir de pilhas colapsadas ('a;b;c' -> amostras)."""
+    raiz = {'total': 0, 'filhos': {}}
+    for pilha, total in contagem.items():
+        no = raiz
+        no['total'] += total
+        for quadro in pilha.split(';'):
+            no = no['filhos'].setdefault(quadro, {'total': 0, 'filhos': {}})
+            no['total'] += total
+    retangulos = []
+    profundidade_maxima = [0]
+
+    def desenhar(no, x, profundidade):
+        profundidade_maxima[0] = max(profundidade_maxima[0], profundidade)
+        for nome, filho in sorted(no['filhos'].items()):
+            w = filho['total'] / raiz['total'] * largura
+            if w >= 0.5:
+                retangulos.append((nome, filho['total'], x, profundidade, w))
+                desenhar(filho, x, profundidade + 1)
+            x += w
+
+    if raiz['total']:
+        desenhar(raiz, 0.0, 0)
+    altura = (profundidade_maxima[0] + 1) * altura_linha + 30
+    partes = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{largura}" height="{altura}" '
+              f'font-family="monospace" font-size="11">',
+              f'<text x="4" y="16">{escape(titulo)} ({raiz["total"]} amostras)</text>']
+    for nome, total, x, profundidade, w in retangulos:
+        y = altura - (profundidade + 1) * altura_linha
+        tom = int(hashlib.md5(nome.encode()).hexdigest()[:2], 16)
+        cor = f"rgb(230,{90 + tom * 120 // 255},40)"
+        rotulo = nome if len(nome) * 7 < w else nome[:max(0, int(w / 7) - 2)] + '..' if w > 21 else ''
+        partes.append(f'<g><title>{escape(nome)} ({total} amostras, {total / raiz["total"]:.1%})</title>'
+                      f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{altura_linha - 1}" fill="{cor}"/>'
+                      f'<text x="{x + 2:.1f}" y="{y + altura_linha - 4}">{escape(rotulo)}</text></g>')
+    partes.append('</svg>')
+    return '\n'.join(partes)
+
+_perfil = None
+_pilha = []
+_thread = None
+_diretorio = None
+
+def ativar(modo='amostragem', diretorio=DIRETORIO_PADRAO, intervalo_s=0.005):
+    """Liga o perfil; os artefatos vão para um subdiretório com a data/hora da execução."""
+    global _perfil, _thread, _diretorio
+    _perfil = PerfilDeterministico() if modo == 'deterministico' else PerfilAmostragem(intervalo_s)
+    _thread = threading.get_ident()
+    _diretorio = os.path.join(diretorio, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    return _perfil
+
+def ativar_de_args(args):
+    if getattr(args, 'perfil_cliente', None):
+        ativar(args.perfil_cliente, args.perfil_diretorio, args.perfil_intervalo)
+
+def ativo():
+    return _perfil is not None
+
+def modo():
+    if _perfil is None:
+        return None
+    return 'deterministico' if isinstance(_perfil, PerfilDeterministico) else 'amostragem'
+
+@contextmanager
+def fase(nome):
+    """Atribui ao perfil `nome` (prefixado pelas fases abertas) o tempo fora das fases internas."""
+    if _perfil is None or threading.get_ident() != _thread:
+        yield
+        return
+    externa = _pilha[-1] if _pilha else None
+    atual = f"{externa}.{nome}" if externa else nome
+    if externa:
+        _perfil.sair(externa)
+    _pilha.append(atual)
+    _perfil.entrar(atual)
+    try:
+        yield
+    finally:
+        _perfil.sair(atual)
+        _pilha.pop()
+        if externa:
+            _perfil.entrar(externa)
+
+def gravar():
+    """Grava os artefatos de cada fase e imprime as funções mais caras; retorna o diretório."""
+    if _perfil is None:
+        return None
+    os.makedirs(_diretorio, exist_ok=True)
+    _perfil.gravar(_diretorio)
+    print(f"\nPerfil do cliente ({modo()}) em {_diretorio}")
+    for nome, (segundos, funcoes) in sorted(_perfil.resumo().items()):
+        print(f"{nome}: {segundos:.3f} s")
+        for funcao, proprio in funcoes:
+            print(f"    {proprio:>8.3f} s  {funcao}")
+    return _diretorio
@@ -0,0 +1,144 @@
+# durability.py
+"""
+Perfis de durabilidade para a carga (generate_data.py) e o benchmark de escrita. Cada
+perfil corresponde às opções de cada backend:
+
+- PostgreSQL: synchronous_commit da sessão e tamanho do lote de commit da carga
+  (None = uma única transação, o comportamento original)
+- MongoDB: write concern (w, j); w='majority' só difere de w=1 em replica set
+- Cassandra: nível de consistência das sessões e commitlog_sync do servidor
+  (periodic, group ou batch). O commitlog é alterado no cassandra.yaml de cada
+  container cassandra* em execução, que é reiniciado; restaurar() volta ao periodic.
+
+Bancos embutidos não têm perfil: rodam sempre com a configuração padrão.
+"""
+import subprocess
+import time
+
+from pymongo import WriteConcern
+
+import cassandra_cluster
+from cache_control import aguardar_backend
+
+PERFIS = {
+    'relaxada': {
+        'postgres': {'synchronous_commit': 'off', 'lote': None},
+        'mongodb': {'w': 1, 'j': False},
+        'cassandra': {'consistencia': 'ONE', 'commitlog': 'periodic'},
+    },
+    'padrao': {
+        'postgres': {'synchronous_commit': 'on', 'lote': None},
+        'mongodb': {},
+        'cassandra': {'consistencia': 'LOCAL_ONE', 'commitlog': 'periodic'},
+    },
+    'duravel': {
+        'postgres': {'synchronous_commit': 'on', 'lote': 1000},
+        'mongodb': {'w': 1, 'j': True},
+        'cassandra': {'consistencia': 'QUORUM', 'commitlog': 'group'},
+    },
+    'estrita': {
+        'postgres': {'synchronous_commit': 'on', 'lote': 1},
+        'mongodb': {'w': 'majority', 'j': True},
+        'cassandra': {'consistencia': 'ALL', 'commitlog': 'batch'},
+    },
+}
+
+CASSANDRA_YAML = '/etc/cassandra/cassandra.yaml'
+# Linhas gravadas no cassandra.yaml; o Cassandra recusa opções de outro modo de sync
+COMMITLOG = {
+    'periodic': ['commitlog_sync: periodic', 'commitlog_sync_period_in_ms: 10000'],
+    'group': ['commitlog_sync: group', 'commitlog_sync_group_window_in_ms: 15'],
+    'batch': ['commitlog_sync: batch'],
+}
+
+def _docker(*args, check=True):
+    return subprocess.run(['docker', *args], check=check, capture_output=True, text=True).stdout
+
+def containers_cassandra():
+    return sorted(_docker('ps', '--filter', 'name=^cassandra', '--format', '{{.Names}}').split())
+
+def aguardar_no(container, timeout=180):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        saida = _docker('exec', container, 'nodetool', 'info', check=False)
+        if any(linha.startswith('Native Transport active') and linha.rstrip().endswith('true')
+               for linha in saida.splitlines()):
+            return
+        time.sleep(2)
+    raise TimeoutError(f"{container} não voltou em {timeout} s")
+
+def alterar_cassandra_yaml(opcoes, linhas, descricao):
+    """
+    Troca as `opcoes` (regex dos nomes) do cassandra.yaml de cada nó por `linhas` e reinicia,
+    um de cada vez, só os nós em que alguma linha ainda não está presente.
+    """
+    for container in containers_cassandra():
+        atuais = _docker('exec', container, 'cat', CASSANDRA_YAML).splitlines()
+        if all(linha in atuais for linha in linhas):
+            continue
+        texto = '\\n'.join(linhas)
+        _docker('exec', container, 'sh', '-c',
+                f"sed -i -E '/^({'|'.join(opcoes)}):/d' {CASSANDRA_YAML} && "
+                f"printf '{texto}\\n' >> {CASSANDRA_YAML}")
+        print(f"Reiniciando {container} com {descricao}...")
+        _docker('restart', container)
+        aguardar_no(container)
+    aguardar_backend('cassandra')
+
+def configurar_commitlog(modo):
+    """Grava o modo de sync do commitlog em cada nó e o reinicia (só os que mudam)."""
+    alterar_cassandra_yaml(['commitlog_sync(_[a-z_]+)?'], COMMITLOG[modo], f"commitlog_sync: {modo}")
+
+def restaurar():
+    """Volta o commitlog do Cassandra ao padrão (periodic)."""
+    configurar_commitlog('periodic')
+
+def preparar(perfil, backend):
+    """
+    Aplica o perfil ao backend e retorna as opções para o loader/benchmark de escrita
+    (synchronous_commit/lote no PostgreSQL, write_concern no MongoDB).
+    """
+    config = PERFIS[perfil].get(backend)
+    if config is None:
+        return {}
+    if backend == 'postgres':
+        return dict(config)
+    if backend == 'mongodb':
+        return {'write_concern': WriteConcern(**config)}
+    cassandra_cluster.configurar(consistencia=config['consistencia'])
+    configurar_commitlog(config['commitlog'])
+    return {}
+
+def descrever(perfil, backend):
+    config = PERFIS[perfil].get(backend)
+    if config is None:
+        return 'n/a'
+    return ', '.join(f"{opcao}={valor}" for opcao, valor in config.items()) or 'padrão do driver'
+
+def perfis_de_texto(texto):
+    """Lista separada por vírgula (argparse type); 'todos' = todos os perfis."""
+    perfis = list(PERFIS) if texto == 'todos' else [perfil.strip() for perfil in texto.split(',')]
+    for perfil in perfis:
+        if perfil not in PERFIS:
+            raise ValueError(f"Perfil de durabilidade desconhecido: {perfil}")
+    return perfis
+
+def adicionar_opcoes_durabilidade(parser):
+    parser.add_argument('--durabilidade', type=perfis_de_texto,
+                        help=f"Perfis de durabilidade a varrer, separados por vírgula ({', '.join(PERFIS)}) "
+                             f"ou 'todos'")
+    return parser
+
+def imprimir_matriz(registros, metrica, titulo):
+    """Tabela backend x perfil com a soma de `metrica` dos registros de cada célula."""
+    perfis = [perfil for perfil in PERFIS if any(r.get('durabilidade') == perfil for r in registros)]
+    backends = list(dict.fromkeys(r['backend'] for r in registros if r.get('durabilidade')))
+    print(f"\n{titulo}")
+    print(f"{'':<12}" + "".join(f"{perfil:>12}" for perfil in perfis))
+    for backend in backends:
+        celulas = []
+        for perfil in perfis:
+            valores = [r[metrica] for r in registros
+                       if r['backend'] == backend and r.get('durabilidade') == perfil and r.get(metrica) is not None]
+            celulas.append(f"{sum(valores):>12.1f}" if valores else f"{'-':>12}")
+        print(f"{backend:<12}" + "".join(celulas))
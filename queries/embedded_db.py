@@ -0,0 +1,117 @@
+# embedded_db.py
+"""
+Bancos embutidos usados como linhas de base: DuckDB (colunar, execução vetorizada) e
+SQLite (orientado a linhas, sem rede). Cada banco é um arquivo em dados/ aberto pelo
+próprio processo, com o mesmo esquema relacional do PostgreSQL.
+
+A conexão de consulta fica aberta entre consultas, como o processo de um servidor;
+fechar() a descarta (modos de cache frios). O duckdb é opcional e só é importado ao
+conectar.
+"""
+import os
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+EMBUTIDOS = ['duckdb', 'sqlite']
+DIRETORIO = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dados'))
+ARQUIVOS = {'duckdb': 'techmarket.duckdb', 'sqlite': 'techmarket.sqlite'}
+
+# Mesmas tabelas do PostgreSQL, na ordem de carga (sem chaves estrangeiras: os dados
+# vêm sempre completos do generate_data)
+TABELAS = {
+    'cliente': """
+        CREATE TABLE IF NOT EXISTS cliente (
+            id INTEGER PRIMARY KEY,
+            nome VARCHAR(100),
+            email VARCHAR(100) UNIQUE,
+            telefone VARCHAR(20),
+            data_cadastro DATE,
+            cpf VARCHAR(14)
+        )""",
+    'produto': """
+        CREATE TABLE IF NOT EXISTS produto (
+            id INTEGER PRIMARY KEY,
+            nome VARCHAR(100),
+            categoria VARCHAR(50),
+            preco DECIMAL(10, 2),
+            estoque INTEGER
+        )""",
+    'pedido': """
+        CREATE TABLE IF NOT EXISTS pedido (
+            id INTEGER PRIMARY KEY,
+            id_cliente INTEGER,
+            data_pedido TIMESTAMP,
+            status VARCHAR(20),
+            valor_total DECIMAL(10, 2)
+        )""",
+    'item_pedido': """
+        CREATE TABLE IF NOT EXISTS item_pedido (
+            id_pedido INTEGER,
+            id_produto INTEGER,
+            quantidade INTEGER,
+            PRIMARY KEY (id_pedido, id_produto)
+        )""",
+    'pagamento': """
+        CREATE TABLE IF NOT EXISTS pagamento (
+            id INTEGER PRIMARY KEY,
+            id_pedido INTEGER,
+            tipo VARCHAR(20),
+            status VARCHAR(20),
+            data_pagamento TIMESTAMP
+        )""",
+}
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_cliente_email ON cliente(email)",
+    "CREATE INDEX IF NOT EXISTS idx_produto_categoria ON produto(categoria)",
+    "CREATE INDEX IF NOT EXISTS idx_pedido_cliente ON pedido(id_cliente)",
+    "CREATE INDEX IF NOT EXISTS idx_pedido_status ON pedido(status)",
+    "CREATE INDEX IF NOT EXISTS idx_pagamento_tipo ON pagamento(tipo)",
+    "CREATE INDEX IF NOT EXISTS idx_pagamento_data ON pagamento(data_pagamento)",
+]
+
+# O SQLite guarda datas e decimais como texto/REAL; os conversores devolvem os mesmos
+# tipos que o psycopg2 (datetime, date, Decimal) para reaproveitar os formatters
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('TIMESTAMP', lambda texto: datetime.fromisoformat(texto.decode()))
+sqlite3.register_converter('DATE', lambda texto: date.fromisoformat(texto.decode()))
+sqlite3.register_converter('DECIMAL', lambda texto: Decimal(texto.decode()))
+
+def caminho(backend):
+    return os.path.join(DIRETORIO, ARQUIVOS[backend])
+
+def conectar(backend):
+    """Nova conexão com o arquivo do backend; o chamador a fecha."""
+    os.makedirs(DIRETORIO, exist_ok=True)
+    if backend == 'duckdb':
+        import duckdb
+        return duckdb.connect(caminho(backend))
+    return sqlite3.connect(caminho(backend), detect_types=sqlite3.PARSE_DECLTYPES)
+
+_conexoes = {}
+
+def conexao(backend):
+    """Conexão de consulta reaproveitada entre consultas."""
+    if backend not in _conexoes:
+        _conexoes[backend] = conectar(backend)
+    return _conexoes[backend]
+
+def fechar(backend):
+    """Fecha a conexão de consulta, descartando o cache de páginas do próprio banco."""
+    conn = _conexoes.pop(backend, None)
+    if conn is not None:
+        conn.close()
+
+def criar_esquema(backend):
+    conn = conectar(backend)
+    try:
+        for ddl in TABELAS.values():
+            conn.execute(ddl)
+        for ddl in INDICES:
+            conn.execute(ddl)
+        conn.commit()
+    finally:
+        conn.close()
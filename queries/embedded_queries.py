@@ -0,0 +1,244 @@
+# embedded_queries.py
+"""
+Q1-Q6 nos bancos embutidos (DuckDB e SQLite), com o mesmo SQL do PostgreSQL adaptado
+a parâmetros '?' e a datas de corte calculadas no cliente, como no MongoDB.
+
+Fases medidas: o DuckDB executa e materializa o resultado no execute (servidor) e o
+fetchall converte as linhas (decodificacao). O SQLite só avança até a primeira linha
+no execute; o restante da execução acontece durante o fetchall.
+"""
+import random
+from datetime import timedelta
+from functools import partial
+from types import SimpleNamespace
+
+import embedded_db
+import result_cache
+import resource_sampler
+import client_profiler
+from cache_control import preparar_cache, preparar_bateria
+from harness import (criar_parser, adicionar_opcoes_amostragem, opcoes_consulta, novo_registro,
+                     finalizar, amostrar_estratificado, anotar_parametros, resumir_distribuicao)
+from postgres_queries import format_row, format_produto, format_mais_vendido, format_pagamento, format_total_gasto
+from timing import Cronometro, consumir_stream
+from time import perf_counter_ns
+
+def _lotes(cursor, tamanho):
+    while True:
+        linhas = cursor.fetchmany(tamanho)
+        if not linhas:
+            return
+        yield from linhas
+
+def explicar(backend, conn, query, params=None):
+    """EXPLAIN ANALYZE no DuckDB (executa a consulta), EXPLAIN QUERY PLAN no SQLite."""
+    try:
+        if backend == 'duckdb':
+            return [linha[1] for linha in conn.execute("EXPLAIN ANALYZE " + query, params or []).fetchall()]
+        return [linha[-1] for linha in conn.execute("EXPLAIN QUERY PLAN " + query, params or []).fetchall()]
+    except Exception as e:
+        return {'erro': str(e)}
+
+def run_embutido(backend, description, query, params=None, formatter=None, capturar_plano=False, imprimir=True,
+                 modo_cache='padrao', fetch_size=None):
+    inicio_ns = perf_counter_ns()
+    chave_cache, em_cache = result_cache.buscar(backend, description, query, params)
+    if em_cache is not None:
+        return result_cache.servir_do_cache(backend, description, em_cache, inicio_ns, formatter,
+                                            imprimir, modo_cache)
+    preparar_cache(backend, modo_cache)
+    conn = embedded_db.conexao(backend)
+    cursor = conn.cursor()
+    cronometro = Cronometro()
+    with cronometro.medir('servidor'):
+        cursor.execute(query, params or [])
+    if fetch_size:
+        results = consumir_stream(_lotes(cursor, fetch_size), cronometro, guardar=imprimir)
+    else:
+        with cronometro.medir('decodificacao'):
+            results = cursor.fetchall()
+        cronometro.marcar_linhas(len(results))
+    cronometro.parar()
+    cursor.close()
+    registro = novo_registro(backend, description, cronometro.tempo_s, modo_cache=modo_cache,
+                             **cronometro.registro())
+    if fetch_size:
+        registro['fetch_size'] = fetch_size
+    if chave_cache is not None:
+        registro['cache'] = 'miss'
+        if imprimir or not fetch_size:
+            result_cache.guardar(chave_cache, backend, result_cache.tabelas_sql(query), results,
+                                 cronometro.tempo_s)
+    if capturar_plano:
+        # Fora do intervalo medido
+        registro['plano'] = explicar(backend, conn, query, params)
+    print(f"{description} - Tempo: {cronometro.tempo_s:.4f} s")
+    if fetch_size:
+        print(f"Primeira linha: {registro['tempo_primeira_linha_s'] or 0:.4f} s | "
+              f"Última linha: {cronometro.tempo_s:.4f} s | Linhas: {registro['linhas']}")
+    with cronometro.medir('formatacao'):
+        if imprimir:
+            if not results:
+                print("Nenhum resultado encontrado.")
+            for row in results:
+                print(formatter(row) if formatter else row)
+    registro['fases_ms'] = cronometro.registro()['fases_ms']
+    print(f"Fases: {cronometro.resumo()}")
+    return registro
+
+def get_first_cliente(backend):
+    """Primeiro cliente com pelo menos um pedido: (email, nome)."""
+    linha = embedded_db.conexao(backend).execute("""
+        SELECT c.email, c.nome
+        FROM cliente c
+        JOIN pedido p ON p.id_cliente = c.id
+        GROUP BY c.id, c.email, c.nome
+        LIMIT 1
+    """).fetchone()
+    return linha if linha else (None, None)
+
+def get_first_categoria(backend):
+    linha = embedded_db.conexao(backend).execute("SELECT DISTINCT categoria FROM produto LIMIT 1").fetchone()
+    return linha[0] if linha else None
+
+def sample_clientes(backend, n, estrato='todos', rng=random):
+    """Sorteia clientes com pedidos, opcionalmente estratificados pelo número de pedidos."""
+    linhas = embedded_db.conexao(backend).execute("""
+        SELECT c.email, c.nome, COUNT(p.id)
+        FROM cliente c
+        JOIN pedido p ON p.id_cliente = c.id
+        GROUP BY c.id, c.email, c.nome
+    """).fetchall()
+    return amostrar_estratificado([((email, nome), total) for email, nome, total in linhas], n, estrato, rng)
+
+def sample_categorias(backend, n, estrato='todas', rng=random):
+    """Sorteia categorias, opcionalmente estratificadas pelo número de produtos."""
+    linhas = embedded_db.conexao(backend).execute(
+        "SELECT categoria, COUNT(*) FROM produto GROUP BY categoria").fetchall()
+    return amostrar_estratificado(linhas, n, estrato, rng)
+
+def consultas(email_cliente, categoria, now=None):
+    """Definição de Q1-Q6 para o cliente e a categoria: lista de (descrição, SQL, parâmetros, formatter)."""
+    now = now or result_cache.referencia()
+    return [
+        ("\nQ1 - Últimos 3 pedidos do primeiro cliente encontrado",
+         """
+         SELECT p.*
+         FROM cliente c
+         JOIN pedido p ON p.id_cliente = c.id
+         WHERE c.email = ?
+         ORDER BY p.data_pedido DESC
+         LIMIT 4
+         """,
+         (email_cliente,), format_row),
+
+        ("\nQ2 - Produtos da primeira categoria encontrada ordenados por preço",
+         """
+         SELECT * FROM produto
+         WHERE categoria = ?
+         ORDER BY preco ASC
+         LIMIT 10
+         """,
+         (categoria,), format_produto),
+
+        ("\nQ3 - Pedidos entregues do primeiro cliente encontrado",
+         """
+         SELECT p.*
+         FROM cliente c
+         JOIN pedido p ON p.id_cliente = c.id
+         WHERE c.email = ? AND p.status = 'entregue'
+         ORDER BY p.data_pedido DESC
+         LIMIT 10
+         """,
+         (email_cliente,), format_row),
+
+        ("\nQ4 - Top 5 produtos mais vendidos",
+         """
+         SELECT pr.nome, SUM(ip.quantidade) AS total_vendido
+         FROM item_pedido ip
+         JOIN produto pr ON pr.id = ip.id_produto
+         GROUP BY pr.nome
+         ORDER BY total_vendido DESC
+         LIMIT 5
+         """,
+         None, format_mais_vendido),
+
+        ("\nQ5 - Pagamentos via PIX no último mês",
+         """
+         SELECT *
+         FROM pagamento
+         WHERE tipo = 'pix' AND data_pagamento >= ?
+         ORDER BY data_pagamento DESC
+         LIMIT 10
+         """,
+         (now - timedelta(days=30),), format_pagamento),
+
+        ("\nQ6 - Total gasto pelo primeiro cliente nos últimos 3 meses",
+         """
+         SELECT c.nome, SUM(p.valor_total) AS total_gasto
+         FROM cliente c
+         JOIN pedido p ON p.id_cliente = c.id
+         WHERE c.email = ? AND p.data_pedido >= ?
+         GROUP BY c.nome
+         LIMIT 10
+         """,
+         (email_cliente, now - timedelta(days=90)), format_total_gasto),
+    ]
+
+def executar_consultas(backend, email_cliente, categoria, **opcoes):
+    """Executa Q1-Q6 no backend embutido e retorna os registros; `opcoes` vão para run_embutido."""
+    return [resource_sampler.medir_registro(backend, run_embutido, backend, descricao, sql, params,
+                                            formatter=formatter, **opcoes)
+            for descricao, sql, params, formatter in consultas(email_cliente, categoria)]
+
+def como_modulo(backend):
+    """Funções do backend com a mesma assinatura dos módulos de consulta (usado por scale_sweep)."""
+    return SimpleNamespace(sample_clientes=partial(sample_clientes, backend),
+                           sample_categorias=partial(sample_categorias, backend),
+                           executar_consultas=partial(executar_consultas, backend))
+
+if __name__ == "__main__":
+    parser = adicionar_opcoes_amostragem(criar_parser("Consultas Q1-Q6 no DuckDB e no SQLite"))
+    parser.add_argument('--backend', choices=embedded_db.EMBUTIDOS + ['ambos'], default='ambos')
+    args = parser.parse_args()
+    backends = embedded_db.EMBUTIDOS if args.backend == 'ambos' else [args.backend]
+    resultados = []
+    if args.cache_resultados:
+        result_cache.ativar(args.cache_capacidade, args.cache_ttl)
+    if args.recursos:
+        resource_sampler.ativar(args.recursos_intervalo)
+    client_profiler.ativar_de_args(args)
+
+    for backend in backends:
+        print(f"\n=== {backend} ({embedded_db.caminho(backend)}) ===")
+        if args.amostras:
+            rng = random.Random(args.semente)
+            clientes = sample_clientes(backend, args.amostras, args.estrato_clientes, rng)
+            categorias = sample_categorias(backend, args.amostras, args.estrato_categorias, rng)
+            preparar_bateria(backend, args.modo_cache)
+            registros_backend = []
+            for ((email_cliente, nome_cliente), pedidos_cliente), (categoria, produtos_categoria) in zip(clientes,
+                                                                                                        categorias):
+                print(f"\nCliente: {nome_cliente} ({email_cliente}, {pedidos_cliente} pedidos) | "
+                      f"Categoria: {categoria} ({produtos_categoria} produtos)")
+                registros = executar_consultas(backend, email_cliente, categoria,
+                                               **opcoes_consulta(args, imprimir=False))
+                registros_backend.extend(anotar_parametros(registros, cliente=email_cliente,
+                                                           pedidos_cliente=pedidos_cliente, categoria=categoria,
+                                                           produtos_categoria=produtos_categoria))
+            resumir_distribuicao(registros_backend, titulo=f"{backend} - tempo até a última linha")
+            resultados.extend(registros_backend)
+        else:
+            email_cliente, nome_cliente = get_first_cliente(backend)
+            categoria = get_first_categoria(backend)
+            if not email_cliente or not categoria:
+                print("Nenhum cliente/categoria encontrado; rode generate_data.py --embutidos.")
+                continue
+            print(f"Cliente encontrado: {nome_cliente} ({email_cliente})")
+            print(f"Categoria encontrada: {categoria}")
+            preparar_bateria(backend, args.modo_cache)
+            resultados.extend(executar_consultas(backend, email_cliente, categoria, **opcoes_consulta(args)))
+
+    if args.cache_resultados:
+        result_cache.relatorio()
+    finalizar(resultados, args)
@@ -0,0 +1,167 @@
+# harness.py
+"""
+Utilitários compartilhados pelos scripts de consulta: opções de linha de comando
+e registro dos resultados (tempos e diagnósticos) em arquivo JSONL.
+"""
+import argparse
+import json
+from datetime import datetime
+
+import client_profiler
+import results_store
+
+# Ver cache_control.py
+MODOS_CACHE = ['padrao', 'frio', 'frio-caches', 'quente']
+
+def criar_parser(descricao):
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument('--capturar-planos', action='store_true',
+                        help="Captura plano de execução/estatísticas do servidor para cada consulta")
+    parser.add_argument('--saida',
+                        help="Arquivo JSONL onde os resultados (tempos e diagnósticos) são acrescentados")
+    parser.add_argument('--modo-cache', choices=MODOS_CACHE, default='padrao',
+                        help="frio: reinicia o container antes de cada consulta; frio-caches: apenas descarta "
+                             "caches; quente: aquece tabelas e índices antes da bateria")
+    parser.add_argument('--fetch-size', type=int,
+                        help="Consome os resultados em streaming, em lotes deste tamanho "
+                             "(cursor nomeado no Postgres, batchSize no MongoDB, fetch_size no Cassandra)")
+    parser.add_argument('--cache-resultados', action='store_true',
+                        help="Ativa o cache de resultados em memória (LRU + TTL) na frente das consultas")
+    parser.add_argument('--cache-capacidade', type=int, default=256, help="Máximo de entradas no cache")
+    parser.add_argument('--cache-ttl', type=float, default=60.0, help="Validade das entradas do cache, em segundos")
+    parser.add_argument('--recursos', action='store_true',
+                        help="Amostra CPU, memória, IO e rede dos containers e do cliente em cada consulta/carga")
+    parser.add_argument('--recursos-intervalo', type=float, default=0.5,
+                        help="Intervalo entre amostras de memória, em segundos")
+    return adicionar_opcoes_historico(adicionar_opcoes_perfil(parser))
+
+def adicionar_opcoes_perfil(parser):
+    """Opções do perfil do cliente (client_profiler.py)."""
+    parser.add_argument('--perfil-cliente', choices=client_profiler.MODOS,
+                        help="Perfila o código Python por fase: cProfile (deterministico) ou pilhas amostradas "
+                             "com flame graph (amostragem)")
+    parser.add_argument('--perfil-diretorio', default=client_profiler.DIRETORIO_PADRAO,
+                        help="Diretório dos artefatos do perfil (um subdiretório por execução)")
+    parser.add_argument('--perfil-intervalo', type=float, default=0.005,
+                        help="Intervalo entre amostras de pilha no modo amostragem, em segundos")
+    return parser
+
+def adicionar_opcoes_historico(parser):
+    """Opções do histórico de execuções (results_store.py), usadas por finalizar()."""
+    parser.add_argument('--historico', default=results_store.CAMINHO_PADRAO,
+                        help="Arquivo SQLite onde cada execução é registrada")
+    parser.add_argument('--sem-historico', action='store_true', help="Não registra a execução no histórico")
+    parser.add_argument('--perfil-indices', default='padrao',
+                        help="Rótulo do conjunto de índices em uso, gravado no histórico")
+    return parser
+
+def opcoes_consulta(args, **extras):
+    """Opções de linha de comando repassadas a executar_consultas/run_*."""
+    opcoes = {
+        'capturar_plano': args.capturar_planos,
+        'modo_cache': args.modo_cache,
+        'fetch_size': args.fetch_size,
+    }
+    opcoes.update(extras)
+    return opcoes
+
+def novo_registro(backend, descricao, tempo, **extras):
+    """Cria o registro de uma execução; diagnósticos ficam ao lado do tempo medido."""
+    descricao = descricao.strip()
+    registro = {
+        'backend': backend,
+        'consulta': descricao.split(' - ')[0],
+        'descricao': descricao,
+        'tempo_s': tempo,
+        'timestamp': datetime.now().isoformat(),
+    }
+    registro.update(extras)
+    return registro
+
+def salvar_resultados(registros, caminho):
+    registros = [r for r in registros if r]
+    with open(caminho, 'a', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, default=str, ensure_ascii=False) + '\n')
+    print(f"{len(registros)} resultados gravados em {caminho}")
+
+def finalizar(registros, args):
+    """Fim de cada script: grava o perfil do cliente, o JSONL de --saida e registra a execução no histórico."""
+    client_profiler.gravar()
+    if getattr(args, 'saida', None):
+        salvar_resultados(registros, args.saida)
+    if not getattr(args, 'sem_historico', True):
+        results_store.registrar(registros, args, caminho=args.historico)
+
+# --- Amostragem de parâmetros e distribuição de latências ---
+def adicionar_opcoes_amostragem(parser):
+    parser.add_argument('--amostras', type=int, default=0,
+                        help="Número de clientes/categorias amostrados (0 = apenas o primeiro encontrado)")
+    parser.add_argument('--estrato-clientes', choices=['todos', 'leves', 'pesados'], default='todos',
+                        help="Restringe a amostra ao terço de clientes com menos/mais pedidos")
+    parser.add_argument('--estrato-categorias', choices=['todas', 'pequenas', 'grandes'], default='todas',
+                        help="Restringe a amostra ao terço de categorias com menos/mais produtos")
+    parser.add_argument('--semente', type=int, help="Semente para tornar a amostragem reprodutível")
+    return parser
+
+def amostrar_estratificado(contagens, n, estrato, rng):
+    """
+    Sorteia n parâmetros de uma lista de (parametro, contagem). Os estratos
+    'leves'/'pequenas' e 'pesados'/'grandes' usam o terço inferior/superior
+    ordenado pela contagem. Sorteia com reposição se o estrato for menor que n.
+    """
+    ordenados = sorted(contagens, key=lambda item: item[1])
+    terco = max(1, len(ordenados) // 3)
+    if estrato in ('leves', 'pequenas'):
+        ordenados = ordenados[:terco]
+    elif estrato in ('pesados', 'grandes'):
+        ordenados = ordenados[-terco:]
+    if not ordenados:
+        return []
+    if n <= len(ordenados):
+        return rng.sample(ordenados, n)
+    return rng.choices(ordenados, k=n)
+
+def anotar_parametros(registros, **parametros):
+    for registro in registros:
+        if registro:
+            registro['parametros'] = parametros
+    return registros
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+def amostrar_latencias(latencias_ms, n=500):
+    """Até n latências espaçadas ao longo da rodada, guardadas nos registros de vazão para o histórico."""
+    if len(latencias_ms) <= n:
+        return list(latencias_ms)
+    return [latencias_ms[i * len(latencias_ms) // n] for i in range(n)]
+
+def resumir_distribuicao(registros, campo='tempo_s', titulo=None):
+    """Imprime e retorna a distribuição de latências (ms) por consulta."""
+    por_consulta = {}
+    for registro in registros:
+        if registro and registro.get(campo) is not None:
+            por_consulta.setdefault(registro['consulta'], []).append(registro[campo] * 1000)
+
+    resumo = {}
+    if titulo:
+        print(f"\n{titulo}")
+    print(f"\n{'Consulta':<10}{'n':>5}{'mín':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'máx':>10}{'média':>10}  (ms)")
+    for consulta in sorted(por_consulta):
+        valores = por_consulta[consulta]
+        resumo[consulta] = {
+            'n': len(valores), 'min': min(valores), 'p50': percentil(valores, 50),
+            'p95': percentil(valores, 95), 'p99': percentil(valores, 99),
+            'max': max(valores), 'media': sum(valores) / len(valores),
+        }
+        r = resumo[consulta]
+        print(f"{consulta:<10}{r['n']:>5}{r['min']:>10.2f}{r['p50']:>10.2f}{r['p95']:>10.2f}"
+              f"{r['p99']:>10.2f}{r['max']:>10.2f}{r['media']:>10.2f}")
+    return resumo
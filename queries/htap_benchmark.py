@@ -0,0 +1,256 @@
+# htap_benchmark.py
+"""
+Leitura sob ingestão (HTAP): Q1-Q6 rodam continuamente enquanto threads gravam novos
+pedidos e pagamentos (write_benchmark.novo_pedido) a uma taxa fixa. Para cada taxa de
+--taxas, mede:
+
+- a distribuição de latência de cada consulta e quanto o p99 piora em relação à
+  primeira taxa (use 0 como linha de base)
+- a taxa de ingestão alcançada (a ingestão é em malha aberta: um atraso maior que 1 s
+  descarta as operações atrasadas, contadas como 'perdidas')
+- a visibilidade das próprias escritas: uma sonda grava um pedido e o lê logo após a
+  confirmação, repetindo até encontrá-lo. Reporta a fração de primeiras leituras que
+  não viram a escrita e o atraso até a leitura que a viu (inclui a própria leitura).
+
+O registro 'HTAP' de cada taxa resume ingestão, visibilidade e latências; não tem
+tempo_s para não se misturar às consultas no histórico.
+"""
+import random
+import threading
+from time import perf_counter, perf_counter_ns
+
+import postgres_queries
+import mongodb_queries
+import cassandra_queries
+import resource_sampler
+import client_profiler
+import payment_schema
+from harness import (criar_parser, adicionar_opcoes_amostragem, opcoes_consulta, novo_registro, percentil,
+                     finalizar, anotar_parametros, resumir_distribuicao)
+from write_benchmark import ESCRITAS, OperacaoAbortada
+from cassandra_cluster import adicionar_opcoes_cassandra, configurar_de_args, configurar, consistencia_atual
+
+MODULOS = {'postgres': postgres_queries, 'mongodb': mongodb_queries, 'cassandra': cassandra_queries}
+
+class Ingestao:
+    """Threads que chamam novo_pedido em ritmo fixo, divididas igualmente na taxa total."""
+
+    def __init__(self, escrita, taxa, threads, semente=None):
+        self.escrita = escrita
+        self.taxa = taxa
+        self.threads = threads if taxa else 0
+        self.semente = semente
+        self.medicao = {'latencias_ns': [], 'abortados': 0, 'erros': 0, 'perdidas': 0}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._threads = []
+
+    def _trabalhador(self, indice):
+        rng = random.Random(None if self.semente is None else self.semente + indice)
+        intervalo = self.threads / self.taxa
+        proximo = perf_counter() + intervalo * indice / self.threads
+        while not self._parar.is_set():
+            espera = proximo - perf_counter()
+            if espera > 0 and self._parar.wait(espera):
+                return
+            if espera < -1.0:
+                # Servidor não acompanha a taxa: descarta o atraso em vez de enviar em rajada
+                perdidas = int(-espera / intervalo)
+                proximo += perdidas * intervalo
+                with self._lock:
+                    self.medicao['perdidas'] += perdidas
+            proximo += intervalo
+            inicio = perf_counter_ns()
+            try:
+                self.escrita.novo_pedido(rng)
+                campo, valor = 'latencias_ns', perf_counter_ns() - inicio
+            except OperacaoAbortada:
+                campo, valor = 'abortados', None
+            except Exception as e:
+                print(f"Erro na ingestão: {e}")
+                campo, valor = 'erros', None
+            with self._lock:
+                if valor is None:
+                    self.medicao[campo] += 1
+                else:
+                    self.medicao[campo].append(valor)
+
+    def iniciar(self):
+        self.inicio = perf_counter()
+        self._threads = [threading.Thread(target=self._trabalhador, args=(i,), daemon=True)
+                         for i in range(self.threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def parar(self):
+        self._parar.set()
+        for thread in self._threads:
+            thread.join()
+        self.medicao['decorrido_s'] = perf_counter() - self.inicio
+        return self.medicao
+
+class SondaVisibilidade:
+    """Grava um pedido a cada `intervalo_s` e mede quando ele passa a ser lido."""
+
+    def __init__(self, escrita, intervalo_s, timeout_s=10.0, semente=None):
+        self.escrita = escrita
+        self.intervalo_s = intervalo_s
+        self.timeout_s = timeout_s
+        self.rng = random.Random(semente)
+        self.atrasos_ns = []
+        self.primeira_falhou = 0
+        self.nunca_visiveis = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._sondar, daemon=True)
+
+    def _sondar(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                chave = self.escrita.novo_pedido(self.rng)
+            except Exception:
+                continue
+            confirmado = perf_counter_ns()
+            tentativas = 0
+            while True:
+                tentativas += 1
+                if self.escrita.visivel(chave):
+                    self.atrasos_ns.append(perf_counter_ns() - confirmado)
+                    break
+                if perf_counter_ns() - confirmado > self.timeout_s * 1e9:
+                    self.nunca_visiveis += 1
+                    break
+            if tentativas > 1:
+                self.primeira_falhou += 1
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        sondas = len(self.atrasos_ns) + self.nunca_visiveis
+        atrasos_ms = [ns / 1e6 for ns in self.atrasos_ns]
+        atraso = {p: percentil(atrasos_ms, p) for p in (50, 99)}
+        atraso['max'] = max(atrasos_ms, default=None)
+        return {'sondas': sondas, 'primeira_leitura_falhou': self.primeira_falhou,
+                'fracao_primeira_falhou': self.primeira_falhou / sondas if sondas else None,
+                'nunca_visiveis': self.nunca_visiveis, 'atraso_visibilidade_ms': atraso}
+
+def executar_leituras(backend, pares, duracao_s, args, rng):
+    """Roda Q1-Q6 em pares (cliente, categoria) sorteados até o fim da rodada."""
+    modulo = MODULOS[backend]
+    registros = []
+    fim = perf_counter() + duracao_s
+    while perf_counter() < fim:
+        (cliente, _), (categoria, _) = rng.choice(pares)
+        if backend == 'cassandra':
+            id_cliente, email = cliente
+            lote = modulo.executar_consultas(id_cliente, email, categoria, **opcoes_consulta(args, imprimir=False))
+        else:
+            email, _ = cliente
+            lote = modulo.executar_consultas(email, categoria, **opcoes_consulta(args, imprimir=False))
+        registros.extend(r for r in lote if r)
+    return registros
+
+def executar_rodada(backend, escrita, pares, taxa, args, rng):
+    """Uma taxa de ingestão: leituras, ingestão e sonda em paralelo por --duracao segundos."""
+    print(f"\n=== {backend}: ingestão de {taxa:g} pedidos/s ===")
+    ingestao = Ingestao(escrita, taxa, args.ingestores, args.semente)
+    sonda = SondaVisibilidade(escrita, args.visibilidade_intervalo, semente=args.semente)
+    ingestao.iniciar()
+    sonda.iniciar()
+    try:
+        leituras = executar_leituras(backend, pares, args.duracao, args, rng)
+    finally:
+        medicao = ingestao.parar()
+        visibilidade = sonda.parar()
+    distribuicao = resumir_distribuicao(leituras, titulo=f"{backend} - Q1-Q6 sob {taxa:g} pedidos/s")
+    latencias_ms = [ns / 1e6 for ns in medicao['latencias_ns']]
+    resumo = novo_registro(
+        backend, f"HTAP - taxa={taxa:g}", None, decorrido_s=medicao['decorrido_s'], taxa_alvo=taxa,
+        taxa_real=len(latencias_ms) / medicao['decorrido_s'], pedidos=len(latencias_ms),
+        abortados=medicao['abortados'], erros=medicao['erros'], perdidas=medicao['perdidas'],
+        latencia_escrita_ms={p: percentil(latencias_ms, p) for p in (50, 99)},
+        leituras=distribuicao, **visibilidade)
+    print(f"Ingestão: {resumo['taxa_real']:.1f} pedidos/s (alvo {taxa:g}), {medicao['perdidas']} perdidas, "
+          f"{medicao['erros']} erros | Visibilidade: {visibilidade['primeira_leitura_falhou']}/"
+          f"{visibilidade['sondas']} primeiras leituras sem a escrita, "
+          f"p99 {visibilidade['atraso_visibilidade_ms'][99] or 0:.2f} ms")
+    return anotar_parametros(leituras, taxa_ingestao=taxa) + [resumo]
+
+def imprimir_degradacao(backend, resumos):
+    """p99 de cada consulta por taxa, com a razão sobre a primeira taxa."""
+    consultas = sorted({consulta for r in resumos for consulta in r['leituras']})
+    print(f"\n{backend} - p99 (ms) das consultas por taxa de ingestão (razão sobre a primeira taxa)")
+    print(f"{'Consulta':<10}" + "".join(f"{r['taxa_alvo']:>18g}" for r in resumos))
+    for consulta in consultas:
+        base = resumos[0]['leituras'].get(consulta, {}).get('p99')
+        celulas = []
+        for r in resumos:
+            p99 = r['leituras'].get(consulta, {}).get('p99')
+            if p99 is None:
+                celulas.append(f"{'-':>18}")
+            else:
+                razao = f"(x{p99 / base:.2f})" if base else ''
+                celulas.append(f"{p99:>10.2f} {razao:>7}")
+        print(f"{consulta:<10}" + "".join(celulas))
+    print(f"{'ingestão':<10}" + "".join(f"{r['taxa_real']:>18.1f}" for r in resumos))
+    print(f"{'visib. p99':<10}" + "".join(f"{r['atraso_visibilidade_ms'][99] or 0:>18.2f}" for r in resumos))
+
+if __name__ == "__main__":
+    parser = adicionar_opcoes_amostragem(criar_parser("Q1-Q6 sob ingestão contínua de pedidos (HTAP)"))
+    parser.add_argument('--backend', choices=list(MODULOS) + ['todos'], default='todos')
+    parser.add_argument('--taxas', type=lambda texto: [float(taxa) for taxa in texto.split(',')],
+                        default=[0, 50, 200, 1000], help="Taxas de ingestão em pedidos/s, separadas por vírgula")
+    parser.add_argument('--duracao', type=float, default=30.0, help="Duração de cada taxa, em segundos")
+    parser.add_argument('--ingestores', type=int, default=4, help="Threads de ingestão")
+    parser.add_argument('--visibilidade-intervalo', type=float, default=0.2,
+                        help="Intervalo entre as sondas de leitura das próprias escritas, em segundos")
+    parser.add_argument('--candidatos', type=int, default=5000,
+                        help="Pedidos/pagamentos existentes carregados pelo write_benchmark")
+    adicionar_opcoes_cassandra(parser)
+    payment_schema.adicionar_opcoes_esquema(parser)
+    parser.set_defaults(amostras=20)
+    args = parser.parse_args()
+    if args.modo_cache in ('frio', 'frio-caches'):
+        parser.error("os modos frios reiniciam/descartam caches no meio da ingestão; use padrao ou quente")
+    if args.mongo_pagamentos != 'documento' and args.backend in ('mongodb', 'todos'):
+        # A ingestão grava em 'pagamentos' e a Q5 leria a coleção do outro esquema
+        parser.error("a ingestão do write_benchmark grava pagamentos só no esquema documento; "
+                     "carregue o MongoDB com --mongo-pagamentos documento")
+    if args.recursos:
+        resource_sampler.ativar(args.recursos_intervalo)
+    client_profiler.ativar_de_args(args)
+    consistencias = configurar_de_args(args)
+
+    if args.backend in ('mongodb', 'todos'):
+        payment_schema.avisar_se_vazia()
+
+    resultados = []
+    for backend in (list(MODULOS) if args.backend == 'todos' else [args.backend]):
+        rng = random.Random(args.semente)
+        modulo = MODULOS[backend]
+        pares = list(zip(modulo.sample_clientes(args.amostras, args.estrato_clientes, rng),
+                         modulo.sample_categorias(args.amostras, args.estrato_categorias, rng)))
+        if not pares:
+            print(f"{backend}: nenhum cliente/categoria encontrado")
+            continue
+        for nivel in (consistencias if backend == 'cassandra' else [None]):
+            rotulo = backend
+            if backend == 'cassandra':
+                configurar(consistencia=nivel)
+                rotulo = f"{backend} ({consistencia_atual()})"
+            escrita = ESCRITAS[backend](args.ingestores + 1, candidatos=args.candidatos)
+            resumos = []
+            try:
+                for taxa in args.taxas:
+                    registros = executar_rodada(backend, escrita, pares, taxa, args, rng)
+                    if backend == 'cassandra':
+                        registros[-1]['consistencia'] = consistencia_atual()
+                    resumos.append(registros[-1])
+                    resultados.extend(registros)
+            finally:
+                escrita.fechar()
+            imprimir_degradacao(rotulo, resumos)
+
+    finalizar(resultados, args)
@@ -1,9 +1,10 @@
 # init_databases.py
+import argparse
 import psycopg2
 from pymongo import MongoClient
-from cassandra.cluster import Cluster
-from cassandra.auth import PlainTextAuthProvider
 import time
+import cassandra_cluster
+import embedded_db
 
 # PostgreSQL
 def init_postgres():
@@ -68,6 +69,9 @@ def init_postgres():
     );
     """)
 
+    # Estatísticas por instrução (requer shared_preload_libraries, ver docker-compose.yml)
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements;")
+
     # Criar índices
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_cliente_email ON cliente(email);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_produto_categoria ON produto(categoria);")
@@ -98,6 +102,8 @@ def init_mongodb():
     # Criar índices
     db.clientes.create_index('email', unique=True)
     db.produtos.create_index('categoria')
+    # Chave de junção dos $lookup em produtos (no PostgreSQL é a chave primária)
+    db.produtos.create_index('id')
     db.pedidos.create_index('id_cliente')
     db.pedidos.create_index('status')
     db.pagamentos.create_index('tipo')
@@ -106,19 +112,27 @@ def init_mongodb():
     print("MongoDB inicializado com sucesso!")
 
 # Cassandra
-def init_cassandra():
+def init_cassandra(replication_factor=1):
     print("Inicializando Cassandra...")
     # Aguardar Cassandra iniciar completamente
     time.sleep(60)
 
-    cluster = Cluster(['localhost'])
-    session = cluster.connect()
+    cluster, session = cassandra_cluster.conectar(keyspace=None)
 
     # Criar keyspace
-    session.execute("""
+    if replication_factor == 1:
+        replicacao = "{'class': 'SimpleStrategy', 'replication_factor': 1}"
+    else:
+        # Réplicas em cada datacenter do anel
+        datacenters = sorted({host.datacenter for host in cluster.metadata.all_hosts()})
+        replicacao = "{'class': 'NetworkTopologyStrategy', " + \
+                     ", ".join(f"'{dc}': {replication_factor}" for dc in datacenters) + "}"
+    session.execute(f"""
     CREATE KEYSPACE IF NOT EXISTS techmarket
-    WITH replication = {'class': 'SimpleStrategy', 'replication_factor': 1};
+    WITH replication = {replicacao};
     """)
+    # Keyspace já existente: ajusta o fator de replicação (dados antigos exigem nodetool repair)
+    session.execute(f"ALTER KEYSPACE techmarket WITH replication = {replicacao}")
 
     session.set_keyspace('techmarket')
 
@@ -183,8 +197,31 @@ def init_cassandra():
 
     print("Cassandra inicializado com sucesso!")
 
+# DuckDB e SQLite
+def init_embutido(backend):
+    print(f"Inicializando {backend}...")
+    try:
+        embedded_db.criar_esquema(backend)
+    except ImportError as e:
+        print(f"{backend} ignorado: {e}")
+        return
+    print(f"{backend} inicializado em {embedded_db.caminho(backend)}")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria tabelas e índices nos bancos")
+    parser.add_argument('--cassandra-rf', type=int, default=1,
+                        help="Fator de replicação do keyspace techmarket (3 para o anel de 3 nós)")
+    parser.add_argument('--cassandra-contatos', type=lambda texto: texto.split(','),
+                        help="Pontos de contato host[:porta], separados por vírgula")
+    parser.add_argument('--embutidos', action='store_true',
+                        help="Cria também os bancos embutidos (DuckDB e SQLite) em dados/")
+    args = parser.parse_args()
+    cassandra_cluster.configurar(contatos=args.cassandra_contatos)
+
     init_postgres()
     init_mongodb()
-    init_cassandra()
+    init_cassandra(args.cassandra_rf)
+    if args.embutidos:
+        for backend in embedded_db.EMBUTIDOS:
+            init_embutido(backend)
     print("Todos os bancos de dados foram inicializados!")
\ No newline at end of file
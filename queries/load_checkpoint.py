@@ -0,0 +1,134 @@
+# load_checkpoint.py
+"""
+Pontos de controle da carga do generate_data (opções --checkpoint e --retomar).
+Desativado até ativar() ser chamado; desativado, os loaders não mudam.
+
+Ativo, os loaders do PostgreSQL, MongoDB e Cassandra enviam cada tabela em blocos de
+`bloco` linhas e, depois de cada bloco confirmado, gravam no arquivo quantas linhas da
+tabela já foram carregadas. Uma carga interrompida (exceção, timeout, Ctrl+C) é
+retomada com --retomar a partir do último bloco gravado, sem limpar as tabelas:
+
+- os dados são gerados de novo com a semente, a escala e a data de referência gravadas,
+  e os UUIDs do Cassandra saem de um gerador com a mesma semente
+- PostgreSQL: cada bloco é commitado antes de ser gravado no arquivo, e a carga limpa as
+  tabelas em transação própria; a contagem de linhas da tabela diz exatamente onde parar
+- MongoDB: insert_many ordenado grava um prefixo do bloco; também retoma da contagem
+- Cassandra: INSERT é upsert e as chaves são as mesmas, então o bloco que estava em voo
+  é simplesmente reenviado
+
+Backends concluídos guardam o registro CARGA no arquivo e não são recarregados. O tempo
+de cada tentativa até o seu último bloco gravado se acumula, e o registro da carga
+retomada traz o tempo e a vazão somados de todas as tentativas.
+"""
+import json
+import os
+import random
+import uuid
+from datetime import datetime
+from time import perf_counter
+
+RAIZ = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+ARQUIVO_PADRAO = os.path.join(RAIZ, 'resultados', 'carga_checkpoint.json')
+
+_config = None
+
+def ativar(arquivo=ARQUIVO_PADRAO, bloco=10000, retomar=False, **parametros):
+    """
+    Carga nova: grava `parametros` (semente, escala, agora, esquema_pagamentos) num
+    arquivo novo. Retomada: lê o arquivo. Retorna os parâmetros da carga, ou None se
+    não há o que retomar.
+    """
+    global _config
+    if retomar:
+        if not os.path.exists(arquivo):
+            return None
+        with open(arquivo) as f:
+            estado = json.load(f)
+    else:
+        estado = {'criado': datetime.now().isoformat(), 'parametros': dict(parametros, bloco=bloco), 'backends': {}}
+    _config = {'arquivo': arquivo, 'estado': estado, 'inicio': {}, 'enviadas': {}}
+    _gravar()
+    return estado['parametros']
+
+def ativo():
+    return _config is not None
+
+def _gravar():
+    # Arquivo temporário + rename: uma interrupção no meio não corrompe o checkpoint
+    os.makedirs(os.path.dirname(_config['arquivo']), exist_ok=True)
+    temporario = _config['arquivo'] + '.tmp'
+    with open(temporario, 'w') as f:
+        json.dump(_config['estado'], f, indent=2, default=str, ensure_ascii=False)
+    os.replace(temporario, _config['arquivo'])
+
+def _backend(backend):
+    return _config['estado']['backends'].setdefault(backend, {'tentativas': 0, 'segundos': 0.0, 'tabelas': {}})
+
+def concluido(backend):
+    return _config is not None and 'registro' in _config['estado']['backends'].get(backend, {})
+
+def registro(backend):
+    return _config['estado']['backends'][backend]['registro']
+
+def retomando(backend):
+    """Se uma tentativa anterior já gravou blocos do backend (a carga não deve limpar as tabelas)."""
+    return _config is not None and bool(_config['estado']['backends'].get(backend, {}).get('tabelas'))
+
+def iniciar(backend):
+    """Começa uma tentativa de carga do backend; retorna os segundos das tentativas anteriores."""
+    estado = _backend(backend)
+    estado['tentativas'] += 1
+    _config['inicio'][backend] = (perf_counter(), estado['segundos'])
+    _config['enviadas'][backend] = 0
+    _gravar()
+    return estado['segundos']
+
+def gerador_uuid():
+    """uuid4 normalmente; com checkpoint, a mesma sequência de UUIDs a cada tentativa."""
+    if _config is None:
+        return uuid.uuid4
+    rng = random.Random(_config['estado']['parametros']['semente'])
+    return lambda: uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def carregar(backend, tabela, linhas, enviar, confirmadas=None):
+    """
+    Envia `linhas` em blocos com `enviar(bloco)`, gravando o progresso da tabela após cada
+    um. Retoma do último bloco gravado ou, quando o banco informa quantas linhas da
+    tabela já estão confirmadas (`confirmadas`), dessa contagem.
+    """
+    bloco = _config['estado']['parametros']['bloco']
+    estado = _backend(backend)
+    progresso = estado['tabelas'].setdefault(tabela, {'linhas': 0, 'total': len(linhas), 'blocos': 0})
+    inicio = progresso['linhas']
+    if confirmadas is not None:
+        if not inicio <= confirmadas <= min(len(linhas), inicio + bloco):
+            raise RuntimeError(f"{backend}.{tabela} tem {confirmadas} linhas, mas o checkpoint registra {inicio}; "
+                               f"a tabela foi alterada fora da carga. Recomece sem --retomar")
+        inicio = confirmadas
+    if inicio:
+        print(f"{backend}.{tabela}: retomando da linha {inicio} de {len(linhas)}")
+    comeco, anteriores = _config['inicio'][backend]
+    while inicio < len(linhas):
+        atual = linhas[inicio:inicio + bloco]
+        enviar(atual)
+        inicio += len(atual)
+        _config['enviadas'][backend] += len(atual)
+        progresso.update(linhas=inicio, blocos=progresso['blocos'] + 1)
+        estado['segundos'] = anteriores + perf_counter() - comeco
+        _gravar()
+    progresso['linhas'] = inicio
+
+def enviadas(backend):
+    """Linhas enviadas pela tentativa atual (reenvios do Cassandra incluídos)."""
+    return _config['enviadas'].get(backend, 0)
+
+def concluir(backend, registro_carga):
+    """Marca o backend como carregado, guardando o registro CARGA para as próximas retomadas."""
+    _backend(backend)['registro'] = registro_carga
+    _gravar()
+
+def encerrar():
+    """Carga completa: apaga o arquivo de checkpoint."""
+    if _config is not None and os.path.exists(_config['arquivo']):
+        os.remove(_config['arquivo'])
+        print(f"Carga concluída; checkpoint {_config['arquivo']} removido")
@@ -0,0 +1,415 @@
+# olap_queries.py
+"""
+Pacote analítico (A1-A4) sobre os mesmos dados de Q1-Q6:
+
+- A1: receita mensal por categoria (itens x preço, sem pedidos cancelados)
+- A2: mix de meios de pagamento e taxa de recusa por mês
+- A3: retenção por coorte de cadastro (clientes com pedido N meses após o mês de cadastro)
+- A4: percentis do valor do pedido por status (percentil discreto, igual nos backends)
+
+PostgreSQL e DuckDB usam o mesmo SQL; no PostgreSQL as consultas rodam com consulta
+paralela habilitada (--paralelo trabalhadores por Gather). O MongoDB usa pipelines de
+agregação e o Cassandra varre as tabelas por faixas de token e agrega no cliente.
+O SQLite fica de fora: não tem date_trunc nem percentis.
+"""
+import math
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import result_cache
+import resource_sampler
+import client_profiler
+import payment_schema
+from cache_control import preparar_cache, preparar_bateria
+from cassandra_cluster import conectar, consistencia_atual, adicionar_opcoes_cassandra, configurar_de_args
+from cassandra_queries import scan_token_ranges
+from embedded_queries import run_embutido
+from harness import criar_parser, opcoes_consulta, novo_registro, finalizar, resumir_distribuicao
+from mongodb_queries import run_mongodb_query
+from postgres_queries import format_currency_br, run_query
+from timing import Cronometro
+from time import perf_counter_ns
+
+BACKENDS_OLAP = ['postgres', 'mongodb', 'cassandra', 'duckdb']
+PERCENTIS = (0.5, 0.9, 0.99)
+
+# --- Formatação (linhas como tuplas, na ordem das colunas do SQL) ---
+def format_receita(row):
+    mes, categoria, receita, unidades = row
+    return f"{mes:%m/%Y} | {categoria} | Receita: {format_currency_br(receita)} | Unidades: {unidades}"
+
+def format_mix_pagamento(row):
+    mes, tipo, pagamentos, participacao, taxa_recusa = row
+    return (f"{mes:%m/%Y} | {tipo.upper()} | Pagamentos: {pagamentos} | Participação: {participacao:.1%} | "
+            f"Recusa: {taxa_recusa:.1%}")
+
+def format_coorte(row):
+    coorte, meses_desde, ativos, clientes, retencao = row
+    return f"Coorte {coorte:%m/%Y} | Mês +{meses_desde} | Ativos: {ativos}/{clientes} ({retencao:.1%})"
+
+def format_percentis(row):
+    status, pedidos, media, *percentis = row
+    return (f"{status} | Pedidos: {pedidos} | Média: {format_currency_br(media)} | " +
+            " | ".join(f"p{p * 100:g}: {format_currency_br(valor)}" for p, valor in zip(PERCENTIS, percentis)))
+
+def _documento(colunas, formatter):
+    """Formatter de tupla aplicado a um documento do MongoDB."""
+    return lambda doc: formatter(tuple(doc.get(coluna) for coluna in colunas))
+
+# --- PostgreSQL e DuckDB ---
+def consultas_sql():
+    """A1-A4 em SQL: lista de (descrição, SQL, parâmetros, formatter)."""
+    percentis = ",\n                ".join(
+        f"percentile_disc({p}) WITHIN GROUP (ORDER BY valor_total) AS p{p * 100:g}" for p in PERCENTIS)
+    return [
+        ("\nA1 - Receita mensal por categoria",
+         """
+         SELECT date_trunc('month', p.data_pedido) AS mes, pr.categoria,
+                SUM(ip.quantidade * pr.preco) AS receita, SUM(ip.quantidade) AS unidades
+         FROM pedido p
+         JOIN item_pedido ip ON ip.id_pedido = p.id
+         JOIN produto pr ON pr.id = ip.id_produto
+         WHERE p.status <> 'cancelado'
+         GROUP BY 1, 2
+         ORDER BY 1, 2
+         """,
+         None, format_receita),
+
+        ("\nA2 - Mix de meios de pagamento e taxa de recusa por mês",
+         """
+         SELECT mes, tipo, pagamentos,
+                1.0 * pagamentos / SUM(pagamentos) OVER (PARTITION BY mes) AS participacao,
+                1.0 * recusados / pagamentos AS taxa_recusa
+         FROM (
+             SELECT date_trunc('month', data_pagamento) AS mes, tipo, COUNT(*) AS pagamentos,
+                    COUNT(*) FILTER (WHERE status = 'recusado') AS recusados
+             FROM pagamento
+             GROUP BY 1, 2
+         ) por_mes
+         ORDER BY mes, tipo
+         """,
+         None, format_mix_pagamento),
+
+        ("\nA3 - Retenção por coorte de cadastro",
+         """
+         WITH coortes AS (
+             SELECT id, date_trunc('month', data_cadastro::timestamp) AS coorte FROM cliente
+         ), tamanhos AS (
+             SELECT coorte, COUNT(*) AS clientes FROM coortes GROUP BY coorte
+         ), atividade AS (
+             SELECT DISTINCT id_cliente, date_trunc('month', data_pedido) AS mes FROM pedido
+         )
+         SELECT c.coorte,
+                CAST((EXTRACT(YEAR FROM a.mes) - EXTRACT(YEAR FROM c.coorte)) * 12
+                     + EXTRACT(MONTH FROM a.mes) - EXTRACT(MONTH FROM c.coorte) AS INTEGER) AS meses_desde,
+                COUNT(*) AS ativos, t.clientes, 1.0 * COUNT(*) / t.clientes AS retencao
+         FROM atividade a
+         JOIN coortes c ON c.id = a.id_cliente
+         JOIN tamanhos t ON t.coorte = c.coorte
+         WHERE a.mes >= c.coorte
+         GROUP BY c.coorte, meses_desde, t.clientes
+         ORDER BY c.coorte, meses_desde
+         """,
+         None, format_coorte),
+
+        ("\nA4 - Percentis do valor do pedido por status",
+         f"""
+         SELECT status, COUNT(*) AS pedidos, AVG(valor_total) AS media,
+                {percentis}
+         FROM pedido
+         GROUP BY status
+         ORDER BY status
+         """,
+         None, format_percentis),
+    ]
+
+def parametros_paralelos(trabalhadores, forcar=False):
+    """Parâmetros de sessão do PostgreSQL para consulta paralela (0 desabilita)."""
+    parametros = {'max_parallel_workers_per_gather': trabalhadores}
+    if forcar and trabalhadores:
+        # Planeja em paralelo mesmo em tabelas pequenas (escalas baixas da varredura)
+        parametros.update(parallel_setup_cost=0, parallel_tuple_cost=0, min_parallel_table_scan_size=0)
+    return parametros
+
+# --- MongoDB ---
+def _mes(campo):
+    return {"$dateTrunc": {"date": campo, "unit": "month"}}
+
+def _percentil_ordenado(p):
+    # Percentil discreto sobre o array já ordenado: elemento ceil(p * n) - 1
+    posicao = {"$toInt": {"$ceil": {"$multiply": [p, {"$size": "$valores"}]}}}
+    return {"$arrayElemAt": ["$valores", {"$subtract": [posicao, 1]}]}
+
+def consultas_mongodb():
+    """A1-A4 em pipelines de agregação: lista de (descrição, coleção, pipeline, formatter)."""
+    nomes_percentis = [f"p{p * 100:g}" for p in PERCENTIS]
+    return [
+        ("\nA1 - Receita mensal por categoria",
+         "pedidos",
+         [
+             {"$match": {"status": {"$ne": "cancelado"}}},
+             {"$unwind": "$itens"},
+             # Agrupa antes do $lookup: um lookup por (mês, produto) e não por item
+             {"$group": {"_id": {"mes": _mes("$data_pedido"), "id_produto": "$itens.id_produto"},
+                         "quantidade": {"$sum": "$itens.quantidade"}}},
+             {"$lookup": {"from": "produtos", "localField": "_id.id_produto", "foreignField": "id", "as": "produto"}},
+             {"$unwind": "$produto"},
+             {"$group": {"_id": {"mes": "$_id.mes", "categoria": "$produto.categoria"},
+                         "receita": {"$sum": {"$multiply": ["$quantidade", "$produto.preco"]}},
+                         "unidades": {"$sum": "$quantidade"}}},
+             {"$project": {"_id": 0, "mes": "$_id.mes", "categoria": "$_id.categoria", "receita": 1, "unidades": 1}},
+             {"$sort": {"mes": 1, "categoria": 1}},
+         ],
+         _documento(['mes', 'categoria', 'receita', 'unidades'], format_receita)),
+
+        ("\nA2 - Mix de meios de pagamento e taxa de recusa por mês",
+         payment_schema.colecao(),
+         [
+             *payment_schema.etapas_pagamento(),
+             {"$group": {"_id": {"mes": _mes("$data_pagamento"), "tipo": "$tipo"},
+                         "pagamentos": {"$sum": 1},
+                         "recusados": {"$sum": {"$cond": [{"$eq": ["$status", "recusado"]}, 1, 0]}}}},
+             {"$setWindowFields": {"partitionBy": "$_id.mes", "output": {"total_mes": {"$sum": "$pagamentos"}}}},
+             {"$project": {"_id": 0, "mes": "$_id.mes", "tipo": "$_id.tipo", "pagamentos": 1,
+                           "participacao": {"$divide": ["$pagamentos", "$total_mes"]},
+                           "taxa_recusa": {"$divide": ["$recusados", "$pagamentos"]}}},
+             {"$sort": {"mes": 1, "tipo": 1}},
+         ],
+         _documento(['mes', 'tipo', 'pagamentos', 'participacao', 'taxa_recusa'], format_mix_pagamento)),
+
+        ("\nA3 - Retenção por coorte de cadastro",
+         "clientes",
+         [
+             {"$project": {"id": 1, "coorte": _mes("$data_cadastro")}},
+             # Tamanho da coorte antes do $unwind, contando clientes sem pedidos
+             {"$setWindowFields": {"partitionBy": "$coorte", "output": {"clientes": {"$count": {}}}}},
+             {"$lookup": {"from": "pedidos", "localField": "id", "foreignField": "id_cliente", "as": "pedidos",
+                          "pipeline": [{"$project": {"_id": 0, "data_pedido": 1}}]}},
+             {"$unwind": "$pedidos"},
+             {"$group": {"_id": {"id": "$id", "coorte": "$coorte", "mes": _mes("$pedidos.data_pedido")},
+                         "clientes": {"$first": "$clientes"}}},
+             {"$project": {"coorte": "$_id.coorte", "clientes": 1,
+                           "meses_desde": {"$dateDiff": {"startDate": "$_id.coorte", "endDate": "$_id.mes",
+                                                         "unit": "month"}}}},
+             {"$match": {"meses_desde": {"$gte": 0}}},
+             {"$group": {"_id": {"coorte": "$coorte", "meses_desde": "$meses_desde"},
+                         "ativos": {"$sum": 1}, "clientes": {"$first": "$clientes"}}},
+             {"$project": {"_id": 0, "coorte": "$_id.coorte", "meses_desde": "$_id.meses_desde", "ativos": 1,
+                           "clientes": 1, "retencao": {"$divide": ["$ativos", "$clientes"]}}},
+             {"$sort": {"coorte": 1, "meses_desde": 1}},
+         ],
+         _documento(['coorte', 'meses_desde', 'ativos', 'clientes', 'retencao'], format_coorte)),
+
+        ("\nA4 - Percentis do valor do pedido por status",
+         "pedidos",
+         [
+             {"$sort": {"valor_total": 1}},
+             {"$group": {"_id": "$status", "valores": {"$push": "$valor_total"},
+                         "media": {"$avg": "$valor_total"}}},
+             {"$project": {"_id": 0, "status": "$_id", "pedidos": {"$size": "$valores"}, "media": 1,
+                           **{nome: _percentil_ordenado(p) for nome, p in zip(nomes_percentis, PERCENTIS)}}},
+             {"$sort": {"status": 1}},
+         ],
+         _documento(['status', 'pedidos', 'media', *nomes_percentis], format_percentis)),
+    ]
+
+# --- Cassandra (varreduras por faixas de token, agregação no cliente) ---
+def _mes_python(valor):
+    # datetime ou cassandra.util.Date
+    if hasattr(valor, 'date'):
+        valor = valor.date()
+    return datetime(valor.year, valor.month, 1)
+
+def _guardar_produto(produtos, row):
+    produtos[row.id] = (row.categoria, row.preco)
+
+def _somar_itens_mes(quantidades, row):
+    if row.status != 'cancelado' and row.itens:
+        mes = _mes_python(row.data_pedido)
+        for id_produto, quantidade in row.itens.items():
+            quantidades[(mes, id_produto)] += quantidade
+
+def _contar_pagamento(contagens, row):
+    chave = (_mes_python(row.data_pagamento), row.tipo)
+    contagens[chave + ('total',)] += 1
+    if row.status == 'recusado':
+        contagens[chave + ('recusado',)] += 1
+
+def _guardar_coorte(coortes, row):
+    coortes[row.id] = _mes_python(row.data_cadastro)
+
+def _marcar_atividade(atividade, row):
+    atividade.add((row.id_cliente, _mes_python(row.data_pedido)))
+
+def _guardar_valor(valores, row):
+    valores[row.status].append(row.valor_total)
+
+def _combinar(parciais, total):
+    for parcial in parciais:
+        total.update(parcial)
+    return total
+
+def percentil_discreto(ordenados, p):
+    return ordenados[max(0, math.ceil(p * len(ordenados)) - 1)]
+
+def receita_mensal_cassandra(session, fetch_size=1000):
+    produtos = _combinar(scan_token_ranges(session, 'produto', 'id', 'id, categoria, preco', dict,
+                                           _guardar_produto, fetch_size=fetch_size), {})
+    quantidades = _combinar(scan_token_ranges(session, 'pedido_por_cliente', 'id_cliente',
+                                              'data_pedido, status, itens', Counter, _somar_itens_mes,
+                                              fetch_size=fetch_size), Counter())
+    receita = defaultdict(lambda: [0, 0])
+    for (mes, id_produto), quantidade in quantidades.items():
+        if id_produto in produtos:
+            categoria, preco = produtos[id_produto]
+            receita[(mes, categoria)][0] += quantidade * preco
+            receita[(mes, categoria)][1] += quantidade
+    return [(mes, categoria, valor, unidades) for (mes, categoria), (valor, unidades) in sorted(receita.items())]
+
+def mix_pagamento_cassandra(session, fetch_size=1000):
+    contagens = _combinar(scan_token_ranges(session, 'pagamento_por_tipo_data', 'tipo',
+                                            'tipo, data_pagamento, status', Counter, _contar_pagamento,
+                                            fetch_size=fetch_size), Counter())
+    total_mes = Counter()
+    for (mes, _, contador), total in contagens.items():
+        if contador == 'total':
+            total_mes[mes] += total
+    linhas = []
+    for (mes, tipo, contador), total in sorted(contagens.items()):
+        if contador == 'total':
+            linhas.append((mes, tipo, total, total / total_mes[mes], contagens[(mes, tipo, 'recusado')] / total))
+    return linhas
+
+def retencao_coorte_cassandra(session, fetch_size=1000):
+    coortes = _combinar(scan_token_ranges(session, 'cliente', 'id', 'id, data_cadastro', dict,
+                                          _guardar_coorte, fetch_size=fetch_size), {})
+    atividade = _combinar(scan_token_ranges(session, 'pedido_por_cliente', 'id_cliente',
+                                            'id_cliente, data_pedido', set, _marcar_atividade,
+                                            fetch_size=fetch_size), set())
+    tamanhos = Counter(coortes.values())
+    ativos = Counter()
+    for id_cliente, mes in atividade:
+        coorte = coortes.get(id_cliente)
+        if coorte is not None and mes >= coorte:
+            ativos[(coorte, (mes.year - coorte.year) * 12 + mes.month - coorte.month)] += 1
+    return [(coorte, meses_desde, total, tamanhos[coorte], total / tamanhos[coorte])
+            for (coorte, meses_desde), total in sorted(ativos.items())]
+
+def percentis_valor_cassandra(session, fetch_size=1000):
+    parciais = scan_token_ranges(session, 'pedido_por_cliente', 'id_cliente', 'status, valor_total',
+                                 lambda: defaultdict(list), _guardar_valor, fetch_size=fetch_size)
+    valores = defaultdict(list)
+    for parcial in parciais:
+        for status, lista in parcial.items():
+            valores[status].extend(lista)
+    linhas = []
+    for status, lista in sorted(valores.items()):
+        lista.sort()
+        linhas.append((status, len(lista), sum(lista) / len(lista),
+                       *(percentil_discreto(lista, p) for p in PERCENTIS)))
+    return linhas
+
+def consultas_cassandra():
+    """A1-A4 como varreduras: lista de (descrição, função, tabelas lidas, formatter)."""
+    return [
+        ("\nA1 - Receita mensal por categoria", receita_mensal_cassandra,
+         ['produto', 'pedido_por_cliente'], format_receita),
+        ("\nA2 - Mix de meios de pagamento e taxa de recusa por mês", mix_pagamento_cassandra,
+         ['pagamento_por_tipo_data'], format_mix_pagamento),
+        ("\nA3 - Retenção por coorte de cadastro", retencao_coorte_cassandra,
+         ['cliente', 'pedido_por_cliente'], format_coorte),
+        ("\nA4 - Percentis do valor do pedido por status", percentis_valor_cassandra,
+         ['pedido_por_cliente'], format_percentis),
+    ]
+
+def run_olap_cassandra(description, funcao, tabelas, formatter, capturar_plano=False, imprimir=True,
+                       modo_cache='padrao', fetch_size=None):
+    """Executa uma varredura de consultas_cassandra() no formato de run_top_produtos."""
+    inicio_ns = perf_counter_ns()
+    chave_cache, em_cache = result_cache.buscar('cassandra', description, funcao.__name__)
+    if em_cache is not None:
+        return result_cache.servir_do_cache('cassandra', description, em_cache, inicio_ns, formatter,
+                                            imprimir, modo_cache)
+    preparar_cache('cassandra', modo_cache)
+    cluster, session = conectar()
+    try:
+        cronometro = Cronometro()
+        with cronometro.medir('servidor'):
+            linhas = funcao(session, fetch_size=fetch_size or 1000)
+        cronometro.marcar_linhas(len(linhas))
+        cronometro.parar()
+        print(f"{description} - Tempo: {cronometro.tempo_s:.4f} s")
+        registro = novo_registro('cassandra', description, cronometro.tempo_s,
+                                 modo_cache=modo_cache, consistencia=consistencia_atual(), **cronometro.registro())
+        if chave_cache is not None:
+            registro['cache'] = 'miss'
+            result_cache.guardar(chave_cache, 'cassandra', tabelas, linhas, cronometro.tempo_s)
+        with cronometro.medir('formatacao'):
+            if imprimir:
+                if not linhas:
+                    print("Nenhum resultado encontrado.")
+                for row in linhas:
+                    print(formatter(row))
+        registro['fases_ms'] = cronometro.registro()['fases_ms']
+        return registro
+    finally:
+        session.shutdown()
+        cluster.shutdown()
+
+def executar_olap(backend, paralelo=4, forcar_paralelo=False, **opcoes):
+    """Executa A1-A4 no backend e retorna os registros; `opcoes` vão para a função run_* do backend."""
+    if backend == 'postgres':
+        sessao = parametros_paralelos(paralelo, forcar_paralelo)
+        return [resource_sampler.medir_registro('postgres', run_query, descricao, sql, params, formatter=formatter,
+                                                parametros_sessao=sessao, **opcoes)
+                for descricao, sql, params, formatter in consultas_sql()]
+    if backend == 'duckdb':
+        return [resource_sampler.medir_registro('duckdb', run_embutido, 'duckdb', descricao, sql, params,
+                                                formatter=formatter, **opcoes)
+                for descricao, sql, params, formatter in consultas_sql()]
+    if backend == 'mongodb':
+        return [resource_sampler.medir_registro('mongodb', run_mongodb_query, descricao, colecao, pipeline,
+                                                formatter=formatter, **opcoes)
+                for descricao, colecao, pipeline, formatter in consultas_mongodb()]
+    return [resource_sampler.medir_registro('cassandra', run_olap_cassandra, descricao, funcao, tabelas, formatter,
+                                            **opcoes)
+            for descricao, funcao, tabelas, formatter in consultas_cassandra()]
+
+def adicionar_opcoes_olap(parser):
+    parser.add_argument('--paralelo', type=int, default=4,
+                        help="max_parallel_workers_per_gather do PostgreSQL nas consultas A1-A4 (0 desabilita)")
+    parser.add_argument('--forcar-paralelo', action='store_true',
+                        help="Zera os custos de paralelismo do planejador do PostgreSQL (útil em escalas pequenas)")
+    return parser
+
+if __name__ == "__main__":
+    parser = adicionar_opcoes_cassandra(adicionar_opcoes_olap(criar_parser("Consultas analíticas A1-A4")))
+    parser.add_argument('--backend', choices=BACKENDS_OLAP + ['todos'], default='todos')
+    parser.add_argument('--repeticoes', type=int, default=1, help="Execuções de A1-A4 por backend")
+    payment_schema.adicionar_opcoes_esquema(parser)
+    args = parser.parse_args()
+    configurar_de_args(args)
+    payment_schema.ativar_de_args(args)
+    backends = BACKENDS_OLAP if args.backend == 'todos' else [args.backend]
+    if 'mongodb' in backends:
+        payment_schema.avisar_se_vazia()
+    if args.cache_resultados:
+        result_cache.ativar(args.cache_capacidade, args.cache_ttl)
+    if args.recursos:
+        resource_sampler.ativar(args.recursos_intervalo)
+    client_profiler.ativar_de_args(args)
+
+    resultados = []
+    for backend in backends:
+        print(f"\n=== {backend} ===")
+        preparar_bateria(backend, args.modo_cache)
+        registros = []
+        for repeticao in range(args.repeticoes):
+            registros.extend(r for r in executar_olap(backend, paralelo=args.paralelo,
+                                                      forcar_paralelo=args.forcar_paralelo,
+                                                      **opcoes_consulta(args, imprimir=repeticao == 0)) if r)
+        resumir_distribuicao(registros, titulo=f"{backend} - tempo das consultas analíticas")
+        resultados.extend(registros)
+    if args.cache_resultados:
+        result_cache.relatorio()
+    finalizar(resultados, args)
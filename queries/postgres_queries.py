@@ -1,7 +1,15 @@
 import psycopg2
-import time
+import random
+import result_cache
+import resource_sampler
+import client_profiler
 from datetime import datetime
 from decimal import Decimal
+from cache_control import preparar_cache, preparar_bateria
+from harness import (criar_parser, adicionar_opcoes_amostragem, opcoes_consulta, novo_registro,
+                     finalizar, amostrar_estratificado, anotar_parametros, resumir_distribuicao)
+from timing import Cronometro, consumir_stream
+from time import perf_counter_ns
 
 def format_currency_br(valor: Decimal) -> str:
     valor_str = f"{valor:,.2f}"  
@@ -32,23 +40,124 @@ def format_total_gasto(row):
     total_formatado = format_currency_br(total)
     return f"Cliente: {nome} | Total gasto: {total_formatado}"
 
-def run_query(description, query, params=None, formatter=None):
+PG_STAT_STATEMENTS_SNAPSHOT = """
+    SELECT queryid, query, calls, total_exec_time, rows,
+           shared_blks_hit, shared_blks_read, temp_blks_written
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+def snapshot_pg_stat_statements(conn):
+    """Retorna {queryid: linha} do pg_stat_statements ou None se a extensão não estiver ativa."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(PG_STAT_STATEMENTS_SNAPSHOT)
+        colunas = [c.name for c in cursor.description]
+        return {row[0]: dict(zip(colunas, row)) for row in cursor.fetchall()}
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"pg_stat_statements indisponível: {e}")
+        return None
+    finally:
+        cursor.close()
+
+def delta_pg_stat_statements(antes, depois):
+    """Diferença entre dois snapshots, apenas para as instruções executadas no intervalo."""
+    deltas = []
+    for queryid, atual in depois.items():
+        anterior = antes.get(queryid, {})
+        chamadas = atual['calls'] - anterior.get('calls', 0)
+        if chamadas <= 0 or 'pg_stat_statements' in atual['query']:
+            continue
+        delta = {'query': atual['query'], 'calls': chamadas}
+        for campo in ('total_exec_time', 'rows', 'shared_blks_hit', 'shared_blks_read', 'temp_blks_written'):
+            delta[campo] = atual[campo] - anterior.get(campo, 0)
+        deltas.append(delta)
+    return deltas
+
+def explain_analyze(conn, query, params=None):
+    """Executa EXPLAIN (ANALYZE, BUFFERS) e devolve o plano em JSON."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+        return cursor.fetchone()[0]
+    except psycopg2.Error as e:
+        conn.rollback()
+        return {'erro': str(e)}
+    finally:
+        cursor.close()
+
+def run_query(description, query, params=None, formatter=None, capturar_plano=False, imprimir=True,
+              modo_cache='padrao', fetch_size=None, parametros_sessao=None):
+    """
+    Fases medidas: no cursor comum o libpq recebe o resultado inteiro no execute
+    (servidor, inclui a transferência) e o fetchall converte as linhas (decodificacao).
+    No cursor nomeado cada lote de itersize é buscado e convertido no mesmo FETCH,
+    então a decodificação fica dentro de servidor/transferencia.
+    `parametros_sessao` ({nome: valor}) são aplicados na conexão, p.ex. os de consulta paralela.
+    """
+    inicio_ns = perf_counter_ns()
+    chave_cache, em_cache = result_cache.buscar('postgres', description, query, params)
+    if em_cache is not None:
+        return result_cache.servir_do_cache('postgres', description, em_cache, inicio_ns, formatter,
+                                            imprimir, modo_cache)
+    # Só num miss: um hit do cache de resultados não reinicia o container nem limpa caches
+    preparar_cache('postgres', modo_cache)
     conn = psycopg2.connect(
         host="localhost", database="techmarket",
-        user="techmarket", password="password"
+        user="techmarket", password="password",
+        options=" ".join(f"-c {nome}={valor}" for nome, valor in (parametros_sessao or {}).items())
     )
-    cursor = conn.cursor()
-    start = time.time()
-    cursor.execute(query, params)
-    results = cursor.fetchall()
-    end = time.time()
-    print(f"{description} - Tempo: {end - start:.4f} s")
-    if not results:
-        print("Nenhum resultado encontrado.")
-    for row in results:
-        print(formatter(row) if formatter else row)
+    stats_antes = snapshot_pg_stat_statements(conn) if capturar_plano else None
+    if fetch_size:
+        # Cursor nomeado (server-side): as linhas chegam em lotes de itersize
+        cursor = conn.cursor(name='benchmark')
+        cursor.itersize = fetch_size
+    else:
+        cursor = conn.cursor()
+    cronometro = Cronometro()
+    with cronometro.medir('servidor'):
+        cursor.execute(query, params)
+    if fetch_size:
+        results = consumir_stream(cursor, cronometro, guardar=imprimir)
+    else:
+        with cronometro.medir('decodificacao'):
+            results = cursor.fetchall()
+        cronometro.marcar_linhas(len(results))
+    cronometro.parar()
+    registro = novo_registro('postgres', description, cronometro.tempo_s, modo_cache=modo_cache,
+                             **cronometro.registro())
+    if fetch_size:
+        registro['fetch_size'] = fetch_size
+    if parametros_sessao:
+        registro['parametros_sessao'] = parametros_sessao
+    if chave_cache is not None:
+        registro['cache'] = 'miss'
+        if imprimir or not fetch_size:
+            result_cache.guardar(chave_cache, 'postgres', result_cache.tabelas_sql(query), results,
+                                 cronometro.tempo_s)
+    if capturar_plano:
+        # Diagnósticos coletados fora do intervalo medido
+        if stats_antes is not None:
+            stats_depois = snapshot_pg_stat_statements(conn)
+            if stats_depois is not None:
+                registro['pg_stat_statements'] = delta_pg_stat_statements(stats_antes, stats_depois)
+        registro['plano'] = explain_analyze(conn, query, params)
+    print(f"{description} - Tempo: {cronometro.tempo_s:.4f} s")
+    if fetch_size:
+        print(f"Primeira linha: {registro['tempo_primeira_linha_s'] or 0:.4f} s | "
+              f"Última linha: {cronometro.tempo_s:.4f} s | Linhas: {registro['linhas']}")
+    with cronometro.medir('formatacao'):
+        if imprimir:
+            if not results:
+                print("Nenhum resultado encontrado.")
+            for row in results:
+                print(formatter(row) if formatter else row)
+    registro['fases_ms'] = cronometro.registro()['fases_ms']
+    print(f"Fases: {cronometro.resumo()}")
     cursor.close()
     conn.close()
+    return registro
 
 def get_first_cliente():
     """
@@ -104,86 +213,165 @@ def get_first_categoria():
         cursor.close()
         conn.close()
 
+def sample_clientes(n, estrato='todos', rng=random):
+    """Sorteia clientes com pedidos, opcionalmente estratificados pelo número de pedidos."""
+    conn = psycopg2.connect(
+        host="localhost", database="techmarket",
+        user="techmarket", password="password"
+    )
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT c.email, c.nome, COUNT(p.id)
+            FROM cliente c
+            JOIN pedido p ON p.id_cliente = c.id
+            GROUP BY c.id, c.email, c.nome
+        """)
+        contagens = [((email, nome), total) for email, nome, total in cursor.fetchall()]
+        return amostrar_estratificado(contagens, n, estrato, rng)
+    finally:
+        cursor.close()
+        conn.close()
+
+def sample_categorias(n, estrato='todas', rng=random):
+    """Sorteia categorias, opcionalmente estratificadas pelo número de produtos."""
+    conn = psycopg2.connect(
+        host="localhost", database="techmarket",
+        user="techmarket", password="password"
+    )
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT categoria, COUNT(*) FROM produto GROUP BY categoria")
+        return amostrar_estratificado(cursor.fetchall(), n, estrato, rng)
+    finally:
+        cursor.close()
+        conn.close()
+
+def consultas(email_cliente, categoria):
+    """Definição de Q1-Q6 para o cliente e a categoria: lista de (descrição, SQL, parâmetros, formatter)."""
+    return [
+        # Q1 - Últimos 3 pedidos do primeiro cliente
+        ("\nQ1 - Últimos 3 pedidos do primeiro cliente encontrado",
+         """
+         SELECT p.*
+         FROM cliente c
+         JOIN pedido p ON p.id_cliente = c.id
+         WHERE c.email = %s
+         ORDER BY p.data_pedido DESC
+         LIMIT 4
+         """,
+         (email_cliente,), format_row),
+
+        # Q2 - Produtos da primeira categoria encontrada
+        ("\nQ2 - Produtos da primeira categoria encontrada ordenados por preço",
+         """
+         SELECT * FROM produto
+         WHERE categoria = %s
+         ORDER BY preco ASC
+         LIMIT 10
+         """,
+         (categoria,), format_produto),
+
+        # Q3 - Pedidos entregues do primeiro cliente
+        ("\nQ3 - Pedidos entregues do primeiro cliente encontrado",
+         """
+         SELECT p.*
+         FROM cliente c
+         JOIN pedido p ON p.id_cliente = c.id
+         WHERE c.email = %s AND p.status = 'entregue'
+         ORDER BY p.data_pedido DESC
+         LIMIT 10
+         """,
+         (email_cliente,), format_row),
+
+        # Q4 - Top 5 produtos mais vendidos (não precisa de parâmetros dinâmicos)
+        ("\nQ4 - Top 5 produtos mais vendidos",
+         """
+         SELECT pr.nome, SUM(ip.quantidade) AS total_vendido
+         FROM item_pedido ip
+         JOIN produto pr ON pr.id = ip.id_produto
+         GROUP BY pr.nome
+         ORDER BY total_vendido DESC
+         LIMIT 5
+         """,
+         None, format_mais_vendido),
+
+        # Q5 - Pagamentos via PIX no último mês (não precisa de parâmetros dinâmicos)
+        ("\nQ5 - Pagamentos via PIX no último mês",
+         """
+         SELECT *
+         FROM pagamento
+         WHERE tipo = 'pix' AND data_pagamento >= NOW() - INTERVAL '1 month'
+         ORDER BY data_pagamento DESC
+         LIMIT 10
+         """,
+         None, format_pagamento),
+
+        # Q6 - Total gasto pelo primeiro cliente nos últimos 3 meses
+        ("\nQ6 - Total gasto pelo primeiro cliente nos últimos 3 meses",
+         """
+         SELECT c.nome, SUM(p.valor_total) AS total_gasto
+         FROM cliente c
+         JOIN pedido p ON p.id_cliente = c.id
+         WHERE c.email = %s AND p.data_pedido >= NOW() - INTERVAL '3 months'
+         GROUP BY c.nome
+         LIMIT 10
+         """,
+         (email_cliente,), format_total_gasto),
+    ]
+
+def executar_consultas(email_cliente, categoria, **opcoes):
+    """
+    Executa Q1-Q6 para o cliente e a categoria informados e retorna os registros.
+    `opcoes` são repassadas a run_query (capturar_plano, imprimir, modo_cache, fetch_size).
+    """
+    return [resource_sampler.medir_registro('postgres', run_query, descricao, sql, params, formatter=formatter,
+                                            **opcoes)
+            for descricao, sql, params, formatter in consultas(email_cliente, categoria)]
+
 if __name__ == "__main__":
-    # Buscar cliente e categoria dinamicamente
-    print("Buscando primeiro cliente e categoria disponíveis...")
-    email_cliente, nome_cliente = get_first_cliente()
-    categoria = get_first_categoria()
-    
-    if not email_cliente:
-        print("Nenhum cliente encontrado no banco de dados.")
-        exit()
-    
-    if not categoria:
-        print("Nenhuma categoria encontrada no banco de dados.")
-        exit()
-    
-    print(f"Cliente encontrado: {nome_cliente} ({email_cliente})")
-    print(f"Categoria encontrada: {categoria}")
-    
-    # Q1 - Últimos 3 pedidos do primeiro cliente
-    run_query("\nQ1 - Últimos 3 pedidos do primeiro cliente encontrado",
-              """
-              SELECT p.*
-              FROM cliente c
-              JOIN pedido p ON p.id_cliente = c.id
-              WHERE c.email = %s
-              ORDER BY p.data_pedido DESC
-              LIMIT 4
-              """,
-              (email_cliente,), formatter=format_row)
-   
-    # Q2 - Produtos da primeira categoria encontrada
-    run_query("\nQ2 - Produtos da primeira categoria encontrada ordenados por preço",
-          """
-          SELECT * FROM produto
-          WHERE categoria = %s
-          ORDER BY preco ASC
-          LIMIT 10
-          """,
-          (categoria,), formatter=format_produto)
-   
-    # Q3 - Pedidos entregues do primeiro cliente
-    run_query("\nQ3 - Pedidos entregues do primeiro cliente encontrado",
-              """
-              SELECT p.*
-              FROM cliente c
-              JOIN pedido p ON p.id_cliente = c.id
-              WHERE c.email = %s AND p.status = 'entregue'
-              ORDER BY p.data_pedido DESC
-              LIMIT 10
-              """,
-              (email_cliente,), formatter=format_row)
-   
-    # Q4 - Top 5 produtos mais vendidos (não precisa de parâmetros dinâmicos)
-    run_query("\nQ4 - Top 5 produtos mais vendidos",
-              """
-              SELECT pr.nome, SUM(ip.quantidade) AS total_vendido
-              FROM item_pedido ip
-              JOIN produto pr ON pr.id = ip.id_produto
-              GROUP BY pr.nome
-              ORDER BY total_vendido DESC
-              LIMIT 5
-              """, formatter=format_mais_vendido)
-   
-    # Q5 - Pagamentos via PIX no último mês (não precisa de parâmetros dinâmicos)
-    run_query("\nQ5 - Pagamentos via PIX no último mês",
-              """
-              SELECT *
-              FROM pagamento
-              WHERE tipo = 'pix' AND data_pagamento >= NOW() - INTERVAL '1 month'
-              ORDER BY data_pagamento DESC
-              LIMIT 10
-              """, formatter=format_pagamento)
-   
-    # Q6 - Total gasto pelo primeiro cliente nos últimos 3 meses
-    run_query("\nQ6 - Total gasto pelo primeiro cliente nos últimos 3 meses",
-              """
-              SELECT c.nome, SUM(p.valor_total) AS total_gasto
-              FROM cliente c
-              JOIN pedido p ON p.id_cliente = c.id
-              WHERE c.email = %s AND p.data_pedido >= NOW() - INTERVAL '3 months'
-              GROUP BY c.nome
-              LIMIT 10
-              """,
-              (email_cliente,), formatter=format_total_gasto)
\ No newline at end of file
+    args = adicionar_opcoes_amostragem(criar_parser("Consultas Q1-Q6 no PostgreSQL")).parse_args()
+    resultados = []
+    if args.cache_resultados:
+        result_cache.ativar(args.cache_capacidade, args.cache_ttl)
+    if args.recursos:
+        resource_sampler.ativar(args.recursos_intervalo)
+    client_profiler.ativar_de_args(args)
+
+    if args.amostras:
+        rng = random.Random(args.semente)
+        clientes = sample_clientes(args.amostras, args.estrato_clientes, rng)
+        categorias = sample_categorias(args.amostras, args.estrato_categorias, rng)
+        preparar_bateria('postgres', args.modo_cache)
+        for ((email_cliente, nome_cliente), pedidos_cliente), (categoria, produtos_categoria) in zip(clientes, categorias):
+            print(f"\nCliente: {nome_cliente} ({email_cliente}, {pedidos_cliente} pedidos) | "
+                  f"Categoria: {categoria} ({produtos_categoria} produtos)")
+            registros = executar_consultas(email_cliente, categoria, **opcoes_consulta(args, imprimir=False))
+            resultados.extend(anotar_parametros(registros, cliente=email_cliente, pedidos_cliente=pedidos_cliente,
+                                                categoria=categoria, produtos_categoria=produtos_categoria))
+        resumir_distribuicao(resultados, titulo="Tempo até a última linha")
+        if args.fetch_size:
+            resumir_distribuicao(resultados, campo='tempo_primeira_linha_s', titulo="Tempo até a primeira linha")
+    else:
+        # Buscar cliente e categoria dinamicamente
+        print("Buscando primeiro cliente e categoria disponíveis...")
+        email_cliente, nome_cliente = get_first_cliente()
+        categoria = get_first_categoria()
+
+        if not email_cliente:
+            print("Nenhum cliente encontrado no banco de dados.")
+            exit()
+
+        if not categoria:
+            print("Nenhuma categoria encontrada no banco de dados.")
+            exit()
+
+        print(f"Cliente encontrado: {nome_cliente} ({email_cliente})")
+        print(f"Categoria encontrada: {categoria}")
+
+        preparar_bateria('postgres', args.modo_cache)
+        resultados = executar_consultas(email_cliente, categoria, **opcoes_consulta(args))
+
+    if args.cache_resultados:
+        result_cache.relatorio()
+    finalizar(resultados, args)
@@ -0,0 +1,236 @@
+# resource_sampler.py
+"""
+Amostragem de recursos durante cada fase medida (consulta ou carga): CPU, RSS, IO de
+bloco e rede dos containers dos bancos, lidos direto dos arquivos de cgroup (v1 ou v2)
+e de /proc/<pid>/net/dev, e CPU/RSS/IO do próprio cliente Python.
+
+Contadores acumulados (CPU, IO, rede) viram a diferença entre o início e o fim da
+fase; a memória é amostrada a cada `intervalo_s` e reportada como máximo. Se o
+container reiniciar no meio da fase (modo de cache 'frio'), vale o contador desde o
+restart. Fica desativado até ativar() ser chamado (opção --recursos).
+"""
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+import client_profiler
+from cache_control import CONTAINERS
+
+CGROUP_RAIZ = '/sys/fs/cgroup'
+
+def _ler(caminho):
+    with open(caminho) as f:
+        return f.read()
+
+def _ler_chaves(caminho):
+    """Arquivos no formato 'chave valor' por linha (cpu.stat, memory.stat, /proc/self/io)."""
+    valores = {}
+    for linha in _ler(caminho).splitlines():
+        partes = linha.replace(':', ' ').split()
+        if len(partes) >= 2 and partes[1].isdigit():
+            valores[partes[0]] = int(partes[1])
+    return valores
+
+def _rede(pid):
+    """Bytes recebidos/enviados em todas as interfaces (exceto lo) do namespace de rede do pid."""
+    rx = tx = 0
+    for linha in _ler(f'/proc/{pid}/net/dev').splitlines()[2:]:
+        interface, dados = linha.split(':', 1)
+        if interface.strip() == 'lo':
+            continue
+        campos = dados.split()
+        rx += int(campos[0])
+        tx += int(campos[8])
+    return rx, tx
+
+class CgroupContainer:
+    """Localiza o cgroup do container pelo pid principal e lê seus contadores."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.descobrir()
+
+    def descobrir(self):
+        saida = subprocess.run(['docker', 'inspect', '-f', '{{.State.Pid}}', self.nome],
+                               check=True, capture_output=True, text=True).stdout
+        self.pid = int(saida.strip())
+        self.v2 = None
+        self.caminhos = {}
+        for linha in _ler(f'/proc/{self.pid}/cgroup').splitlines():
+            _, controladores, caminho = linha.split(':', 2)
+            if controladores == '':
+                self.v2 = os.path.join(CGROUP_RAIZ, caminho.lstrip('/'))
+            for controlador in controladores.split(','):
+                if controlador in ('cpuacct', 'memory', 'blkio'):
+                    self.caminhos[controlador] = os.path.join(CGROUP_RAIZ, controladores, caminho.lstrip('/'))
+        # Em modo híbrido os controladores ficam na hierarquia v1
+        if self.caminhos:
+            self.v2 = None
+
+    def ler(self):
+        try:
+            return self._ler()
+        except (OSError, ValueError):
+            # Container reiniciado: novo pid (e possivelmente novo cgroup)
+            self.descobrir()
+            return self._ler()
+
+    def _ler(self):
+        if self.v2:
+            cpu_s = _ler_chaves(os.path.join(self.v2, 'cpu.stat'))['usage_usec'] / 1e6
+            rss = _ler_chaves(os.path.join(self.v2, 'memory.stat')).get('anon', 0)
+            leitura = escrita = 0
+            for linha in _ler(os.path.join(self.v2, 'io.stat')).splitlines():
+                campos = dict(campo.split('=') for campo in linha.split()[1:])
+                leitura += int(campos.get('rbytes', 0))
+                escrita += int(campos.get('wbytes', 0))
+        else:
+            cpu_s = int(_ler(os.path.join(self.caminhos['cpuacct'], 'cpuacct.usage'))) / 1e9
+            rss = _ler_chaves(os.path.join(self.caminhos['memory'], 'memory.stat')).get('total_rss', 0)
+            leitura = escrita = 0
+            for linha in _ler(os.path.join(self.caminhos['blkio'], 'blkio.throttle.io_service_bytes')).splitlines():
+                campos = linha.split()
+                if len(campos) == 3 and campos[1] == 'Read':
+                    leitura += int(campos[2])
+                elif len(campos) == 3 and campos[1] == 'Write':
+                    escrita += int(campos[2])
+        rede_rx, rede_tx = _rede(self.pid)
+        return {'cpu_s': cpu_s, 'rss': rss, 'io_leitura': leitura, 'io_escrita': escrita,
+                'rede_rx': rede_rx, 'rede_tx': rede_tx}
+
+class ProcessoCliente:
+    """O próprio processo Python (a rede não é separável por processo e fica de fora)."""
+    nome = 'cliente'
+
+    def ler(self):
+        amostra = {'cpu_s': time.process_time(), 'rss': 0, 'io_leitura': 0, 'io_escrita': 0}
+        try:
+            amostra['rss'] = _ler_chaves('/proc/self/status').get('VmRSS', 0) * 1024
+            io = _ler_chaves('/proc/self/io')
+            amostra['io_leitura'], amostra['io_escrita'] = io.get('read_bytes', 0), io.get('write_bytes', 0)
+        except OSError:
+            pass
+        return amostra
+
+def _delta(inicio, fim):
+    # Contador menor no fim: o container reiniciou durante a fase
+    return fim - inicio if fim >= inicio else fim
+
+class Fase:
+    """Amostras de uma fase medida; `resumo` fica disponível após encerrar()."""
+
+    def __init__(self, alvos, intervalo_s):
+        self.alvos = alvos
+        self.intervalo_s = intervalo_s
+        self.resumo = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        self.inicio = {alvo.nome: alvo.ler() for alvo in self.alvos}
+        self.rss_max = {nome: amostra['rss'] for nome, amostra in self.inicio.items()}
+        self.amostras = 1
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self._registrar({alvo.nome: alvo.ler() for alvo in self.alvos})
+            except Exception:
+                # Container fora do ar durante um restart: a amostra é descartada
+                continue
+
+    def _registrar(self, leituras):
+        for nome, amostra in leituras.items():
+            self.rss_max[nome] = max(self.rss_max[nome], amostra['rss'])
+        self.amostras += 1
+
+    def encerrar(self):
+        self._parar.set()
+        self._thread.join()
+        fim = {alvo.nome: alvo.ler() for alvo in self.alvos}
+        self._registrar(fim)
+        mb = 1024 * 1024
+        self.resumo = {}
+        for nome, amostra in fim.items():
+            inicio = self.inicio[nome]
+            self.resumo[nome] = {
+                'cpu_s': _delta(inicio['cpu_s'], amostra['cpu_s']),
+                'rss_max_mb': self.rss_max[nome] / mb,
+                'io_leitura_mb': _delta(inicio['io_leitura'], amostra['io_leitura']) / mb,
+                'io_escrita_mb': _delta(inicio['io_escrita'], amostra['io_escrita']) / mb,
+            }
+            if 'rede_rx' in amostra:
+                self.resumo[nome]['rede_rx_mb'] = _delta(inicio['rede_rx'], amostra['rede_rx']) / mb
+                self.resumo[nome]['rede_tx_mb'] = _delta(inicio['rede_tx'], amostra['rede_tx']) / mb
+        self.resumo['amostras'] = self.amostras
+        return self.resumo
+
+_config = None
+
+def ativar(intervalo_s=0.5):
+    """Localiza os containers disponíveis; os ausentes são ignorados com um aviso."""
+    global _config
+    containers = {}
+    for backend, nome in CONTAINERS.items():
+        try:
+            containers[backend] = CgroupContainer(nome)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"Amostragem de recursos: container {nome} indisponível ({e})")
+    _config = {'containers': containers, 'cliente': ProcessoCliente(), 'intervalo_s': intervalo_s}
+    return _config
+
+def ativo():
+    return _config is not None
+
+@contextmanager
+def fase(backend):
+    """Amostra o container do backend e o cliente enquanto o bloco executa; produz a Fase (ou None)."""
+    if _config is None:
+        yield None
+        return
+    alvos = [_config['cliente']]
+    if backend in _config['containers']:
+        alvos.insert(0, _config['containers'][backend])
+    atual = Fase(alvos, _config['intervalo_s'])
+    atual.iniciar()
+    try:
+        yield atual
+    finally:
+        atual.encerrar()
+
+def anexar(registro, atual, backend, linhas=None):
+    """Anexa o resumo ao registro com a eficiência em linhas por segundo de CPU do servidor e do cliente."""
+    if atual is None or not registro:
+        return registro
+    registro['recursos'] = atual.resumo
+    linhas = registro.get('linhas') if linhas is None else linhas
+    if linhas is not None:
+        # Bancos embutidos não têm container: a CPU do banco já está na do cliente
+        servidor = atual.resumo.get(CONTAINERS.get(backend), {}).get('cpu_s')
+        cliente = atual.resumo['cliente']['cpu_s']
+        registro['linhas_por_cpu_s_servidor'] = linhas / servidor if servidor else None
+        registro['linhas_por_cpu_s_cliente'] = linhas / cliente if cliente else None
+    return registro
+
+def medir_registro(backend, funcao, *args, **kwargs):
+    """
+    Executa uma função que retorna um registro (run_query etc.) dentro de uma fase amostrada
+    e, com --perfil-cliente, dentro da fase `backend` do perfil do cliente.
+    """
+    with fase(backend) as atual, client_profiler.fase(backend):
+        registro = funcao(*args, **kwargs)
+    if registro and client_profiler.ativo():
+        registro['perfil_cliente'] = client_profiler.modo()
+    if atual is not None:
+        print(f"Recursos: {resumo_texto(atual.resumo)}")
+    return anexar(registro, atual, backend)
+
+def resumo_texto(recursos):
+    return " | ".join(
+        f"{nome}: CPU {valores['cpu_s']:.3f} s, RSS {valores['rss_max_mb']:.0f} MB, "
+        f"IO {valores['io_leitura_mb']:.1f}/{valores['io_escrita_mb']:.1f} MB"
+        for nome, valores in recursos.items() if isinstance(valores, dict)
+    )
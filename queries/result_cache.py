@@ -0,0 +1,190 @@
+# result_cache.py
+"""
+Cache de resultados em memória (LRU limitado + TTL) na frente de run_query,
+run_mongodb_query e run_cassandra_query. A chave é formada pelo backend, pela
+descrição, pelo texto da consulta e pelos parâmetros; cada entrada guarda as
+tabelas/coleções lidas para que os loaders possam invalidá-la com invalidar().
+
+Fica desativado até ativar() ser chamado (opção --cache-resultados). Executado
+diretamente, confere que duas chamadas seguidas de consultas() geram as mesmas chaves.
+"""
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic, perf_counter_ns
+
+from harness import novo_registro
+
+class CacheResultados:
+    def __init__(self, capacidade=256, ttl_s=60.0):
+        self.capacidade = capacidade
+        self.ttl_s = ttl_s
+        self.entradas = OrderedDict()
+        # consulta -> {'hits', 'misses', 'economizado_s'}
+        self.estatisticas = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, consulta):
+        return self.estatisticas.setdefault(consulta, {'hits': 0, 'misses': 0, 'economizado_s': 0.0})
+
+    def obter(self, chave, consulta):
+        with self._lock:
+            entrada = self.entradas.get(chave)
+            if entrada is not None and entrada['expira'] <= monotonic():
+                del self.entradas[chave]
+                entrada = None
+            if entrada is None:
+                self._stats(consulta)['misses'] += 1
+                return None
+            self.entradas.move_to_end(chave)
+            self._stats(consulta)['hits'] += 1
+            return entrada
+
+    def guardar(self, chave, backend, tabelas, linhas, custo_s):
+        with self._lock:
+            self.entradas[chave] = {
+                'backend': backend,
+                'tabelas': set(tabelas),
+                'linhas': linhas,
+                'custo_s': custo_s,
+                'expira': monotonic() + self.ttl_s,
+            }
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.capacidade:
+                self.entradas.popitem(last=False)
+
+    def registrar_economia(self, consulta, segundos):
+        with self._lock:
+            self._stats(consulta)['economizado_s'] += segundos
+
+    def invalidar(self, backend, tabelas=None):
+        """Remove as entradas do backend que leem alguma das tabelas (todas, se None)."""
+        with self._lock:
+            removidas = [
+                chave for chave, entrada in self.entradas.items()
+                if entrada['backend'] == backend and (tabelas is None or entrada['tabelas'] & set(tabelas))
+            ]
+            for chave in removidas:
+                del self.entradas[chave]
+            return len(removidas)
+
+_cache = None
+
+def ativar(capacidade=256, ttl_s=60.0):
+    global _cache
+    _cache = CacheResultados(capacidade, ttl_s)
+    return _cache
+
+def ativo():
+    return _cache is not None
+
+def tabelas_sql(query):
+    """Tabelas citadas em FROM/JOIN de uma consulta SQL ou CQL."""
+    return {tabela.lower() for tabela in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)', query, re.IGNORECASE)}
+
+def tabelas_pipeline(collection_name, pipeline):
+    """Coleção consultada mais as coleções usadas em $lookup."""
+    return {collection_name} | {etapa['$lookup']['from'] for etapa in pipeline if '$lookup' in etapa}
+
+def referencia(agora=None):
+    """
+    Instante de referência das janelas relativas (Q5: último mês, Q6: últimos 3 meses),
+    truncado ao minuto. Com datetime.now() o corte entraria nos parâmetros com
+    microssegundos e a chave mudaria a cada chamada.
+    """
+    return (agora or datetime.now()).replace(second=0, microsecond=0)
+
+def chave(backend, descricao, query, params=None):
+    conteudo = json.dumps([backend, descricao.strip(), query, params], default=str, sort_keys=True)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+def _consulta(descricao):
+    return descricao.strip().split(' - ')[0]
+
+def buscar(backend, descricao, query, params=None):
+    """Retorna (chave, entrada); entrada é None em caso de miss e ambos são None com o cache desativado."""
+    if _cache is None:
+        return None, None
+    k = chave(backend, descricao, query, params)
+    return k, _cache.obter(k, _consulta(descricao))
+
+def guardar(k, backend, tabelas, linhas, custo_s):
+    if _cache is not None and k is not None:
+        _cache.guardar(k, backend, tabelas, list(linhas), custo_s)
+
+def invalidar(backend, tabelas=None):
+    """Gancho chamado pelos loaders após alterar dados; sem efeito com o cache desativado."""
+    if _cache is None:
+        return 0
+    return _cache.invalidar(backend, tabelas)
+
+def servir_do_cache(backend, descricao, entrada, inicio_ns, formatter=None, imprimir=True, modo_cache='padrao'):
+    """Imprime as linhas guardadas e monta o registro de um hit."""
+    tempo_s = (perf_counter_ns() - inicio_ns) / 1e9
+    economizado_s = max(0.0, entrada['custo_s'] - tempo_s)
+    _cache.registrar_economia(_consulta(descricao), economizado_s)
+    print(f"{descricao} - Tempo: {tempo_s:.6f} s (cache)")
+    if imprimir:
+        if not entrada['linhas']:
+            print("Nenhum resultado encontrado.")
+        for row in entrada['linhas']:
+            print(formatter(row) if formatter else row)
+    return novo_registro(backend, descricao, tempo_s, modo_cache=modo_cache, linhas=len(entrada['linhas']),
+                         cache='hit', tempo_economizado_s=economizado_s)
+
+def relatorio():
+    """Imprime e retorna hit ratio e latência economizada por consulta."""
+    if _cache is None:
+        return {}
+    print(f"\n{'Consulta':<10}{'hits':>7}{'misses':>8}{'hit ratio':>11}{'economizado (ms)':>18}")
+    for consulta in sorted(_cache.estatisticas):
+        stats = _cache.estatisticas[consulta]
+        total = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+        print(f"{consulta:<10}{stats['hits']:>7}{stats['misses']:>8}{stats['hit_ratio']:>11.1%}"
+              f"{stats['economizado_s'] * 1000:>18.2f}")
+    return _cache.estatisticas
+
+def _chaves_consultas():
+    """Backend -> chaves de Q1-Q6 montadas a partir das definições de consultas() de cada módulo."""
+    # Importados aqui: os módulos de consultas importam este
+    import postgres_queries
+    import mongodb_queries
+    import cassandra_queries
+    import embedded_queries
+    chaves = {
+        'postgres': [chave('postgres', d, sql, params)
+                     for d, sql, params, _ in postgres_queries.consultas('a@b.com', 'Games')],
+        'mongodb': [chave('mongodb', d, colecao, pipeline)
+                    for d, colecao, pipeline, _ in mongodb_queries.consultas('a@b.com', 'Games')],
+        'cassandra': [chave('cassandra', d, cql, params)
+                      for d, cql, params, _, _ in cassandra_queries.consultas(1, 'a@b.com', 'Games')],
+    }
+    for backend in ('duckdb', 'sqlite'):
+        chaves[backend] = [chave(backend, d, sql, params)
+                           for d, sql, params, _ in embedded_queries.consultas('a@b.com', 'Games')]
+    return chaves
+
+def verificar_chaves():
+    """Backend -> consultas cujas chaves mudam entre duas chamadas de consultas()."""
+    while True:
+        minuto = referencia()
+        primeira = _chaves_consultas()
+        time.sleep(0.01)
+        segunda = _chaves_consultas()
+        # Chamadas em minutos diferentes mudam o corte de propósito: repete
+        if referencia() == minuto:
+            break
+    return {backend: [i + 1 for i, (a, b) in enumerate(zip(primeira[backend], segunda[backend])) if a != b]
+            for backend in primeira}
+
+if __name__ == "__main__":
+    instaveis = verificar_chaves()
+    for backend, consultas in instaveis.items():
+        print(f"{backend:<10} " + (", ".join(f"Q{n}" for n in consultas) + " mudam de chave" if consultas else "ok"))
+    sys.exit(1 if any(instaveis.values()) else 0)
@@ -0,0 +1,316 @@
+# results_store.py
+"""
+Histórico local de execuções (SQLite em resultados/historico.sqlite). Cada execução
+guarda a revisão do git (com '-sujo' se houver alterações não commitadas), o script,
+o perfil de índices, a escala e a configuração de linha de comando; cada registro
+produzido vira amostras com backend, chave, escala, métrica e valor. A chave é a descrição
+completa do registro mais os campos que separam rodadas do mesmo script (consistência,
+perfil de durabilidade, estratégia, taxa de ingestão, esquema de pagamentos). As métricas:
+
+- tempo_s: o tempo medido das consultas
+- latencia_s: as latências amostradas por operação dos registros de vazão (ESCRITA,
+  CONTENCAO, VAZAO), que têm tempo_s vazio porque duram o tempo fixo da rodada
+- commits_por_s, qps: a vazão desses registros, uma amostra por rodada
+
+A escala é o número de pedidos carregados no backend: vem do registro (scale_sweep) ou de
+resultados/carga.json, atualizado pelos loaders do generate_data e do async_backends a cada carga.
+
+Comparação entre duas execuções, por (backend, chave, escala, métrica): variação da
+mediana e teste de Mann-Whitney (bilateral, aproximação normal com correção de empates).
+Uma diferença é regressão quando é significativa (p < alfa) e a mediana piora mais
+que o limiar: sobe, nos tempos, ou cai, nas vazões. Execuções com configurações
+diferentes (--modo-cache, --fetch-size...) são comparadas com um aviso, ou recusadas com --estrito.
+
+    python queries/results_store.py listar
+    python queries/results_store.py comparar penultima ultima --limiar 0.1
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+RAIZ = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+CAMINHO_PADRAO = os.path.join(RAIZ, 'resultados', 'historico.sqlite')
+ARQUIVO_CARGA = os.path.join(RAIZ, 'resultados', 'carga.json')
+# Opções que não mudam o que é medido
+OPCOES_IGNORADAS = {'saida', 'historico', 'sem_historico', 'perfil_indices', 'escala', 'perfil_diretorio'}
+# Campos do registro (ou de registro['parametros']) que entram na chave da amostra
+DISCRIMINANTES = ('consistencia', 'durabilidade', 'estrategia', 'taxa_ingestao', 'esquema_pagamentos')
+# Métricas em que maior é melhor; nas demais (tempos, em segundos) maior é pior
+METRICAS_VAZAO = ('commits_por_s', 'qps')
+
+ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS execucao (
+        id INTEGER PRIMARY KEY,
+        inicio TEXT,
+        revisao TEXT,
+        script TEXT,
+        perfil_indices TEXT,
+        escala INTEGER,
+        configuracao TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS amostra (
+        id_execucao INTEGER REFERENCES execucao(id),
+        backend TEXT,
+        consulta TEXT,
+        escala INTEGER,
+        tempo_s REAL,
+        registro TEXT,
+        chave TEXT,
+        metrica TEXT,
+        valor REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_amostra_execucao ON amostra(id_execucao)",
+]
+
+def revisao_git():
+    """Commit atual do repositório; None fora de um checkout."""
+    try:
+        revisao = subprocess.run(['git', 'rev-parse', '--short=12', 'HEAD'], cwd=RAIZ, check=True,
+                                 capture_output=True, text=True).stdout.strip()
+        alteracoes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=RAIZ,
+                                    check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revisao + ('-sujo' if alteracoes else '')
+
+def abrir(caminho=CAMINHO_PADRAO):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    conn = sqlite3.connect(caminho)
+    for ddl in ESQUEMA:
+        conn.execute(ddl)
+    # Históricos anteriores à chave e às métricas: as amostras antigas são lidas como tempo_s
+    colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(amostra)")}
+    for coluna, tipo in (('chave', 'TEXT'), ('metrica', 'TEXT'), ('valor', 'REAL')):
+        if coluna not in colunas:
+            conn.execute(f"ALTER TABLE amostra ADD COLUMN {coluna} {tipo}")
+    return conn
+
+def registrar_carga(backend, pedidos, arquivo=ARQUIVO_CARGA):
+    """Chamado pelos loaders: grava quantos pedidos o backend tem após a carga."""
+    cargas = {}
+    if os.path.exists(arquivo):
+        with open(arquivo) as f:
+            cargas = json.load(f)
+    cargas[backend] = {'pedidos': pedidos, 'data': datetime.now().isoformat()}
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    with open(arquivo, 'w') as f:
+        json.dump(cargas, f, indent=2)
+
+def escalas_carregadas(arquivo=ARQUIVO_CARGA):
+    """Backend -> pedidos da última carga; vazio se nenhuma carga foi registrada."""
+    if not os.path.exists(arquivo):
+        return {}
+    with open(arquivo) as f:
+        return {backend: carga['pedidos'] for backend, carga in json.load(f).items()}
+
+def configuracao(args):
+    """Opções de linha de comando relevantes para a comparação, em JSON ordenado."""
+    opcoes = {nome: valor for nome, valor in vars(args).items() if nome not in OPCOES_IGNORADAS}
+    return json.dumps(opcoes, default=str, sort_keys=True, ensure_ascii=False)
+
+def chave(registro):
+    """Descrição completa mais os campos discriminantes presentes no registro."""
+    campos = dict(registro.get('parametros') or {}, **registro)
+    discriminantes = [f"{campo}={campos[campo]}" for campo in DISCRIMINANTES if campos.get(campo) is not None]
+    descricao = registro.get('descricao') or registro.get('consulta')
+    return f"{descricao} [{', '.join(discriminantes)}]" if discriminantes else descricao
+
+def metricas(registro):
+    """(métrica, valor) do registro: o tempo, as latências amostradas (em s) e as vazões."""
+    valores = []
+    if registro.get('tempo_s') is not None:
+        valores.append(('tempo_s', registro['tempo_s']))
+    valores.extend(('latencia_s', ms / 1000) for ms in registro.get('latencias_amostra_ms') or [])
+    valores.extend((metrica, registro[metrica]) for metrica in METRICAS_VAZAO if registro.get(metrica) is not None)
+    return valores
+
+def registrar(registros, args, script=None, caminho=CAMINHO_PADRAO):
+    """Grava a execução e seus registros; retorna o id da execução."""
+    script = script or os.path.basename(sys.argv[0])
+    carregadas = escalas_carregadas()
+    registros = [r for r in registros if r]
+    escalas = [r.get('escala', carregadas.get(r.get('backend'))) for r in registros]
+    # A execução só tem escala própria quando todas as amostras têm a mesma
+    escala = getattr(args, 'escala', None)
+    if escala is None and len(set(escalas)) == 1:
+        escala = escalas[0]
+    conn = abrir(caminho)
+    try:
+        cursor = conn.execute(
+            "INSERT INTO execucao (inicio, revisao, script, perfil_indices, escala, configuracao) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(), revisao_git(), script, getattr(args, 'perfil_indices', None), escala,
+             configuracao(args)))
+        id_execucao = cursor.lastrowid
+        linhas = []
+        for r, escala_registro in zip(registros, escalas):
+            # O registro vai inteiro só na primeira linha; sem métricas (resumos), numa linha sem valor
+            texto = json.dumps(r, default=str, ensure_ascii=False)
+            for metrica, valor in metricas(r) or [(None, None)]:
+                linhas.append((id_execucao, r.get('backend'), r.get('consulta'), escala_registro, r.get('tempo_s'),
+                               texto, chave(r), metrica, valor))
+                texto = None
+        conn.executemany(
+            "INSERT INTO amostra (id_execucao, backend, consulta, escala, tempo_s, registro, chave, metrica, valor) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Execução #{id_execucao} registrada em {caminho}")
+    return id_execucao
+
+# --- Consulta ao histórico ---
+def resolver_execucao(conn, referencia):
+    """Id, 'ultima', 'penultima' ou prefixo de revisão (a execução mais recente dela)."""
+    if referencia in ('ultima', 'penultima'):
+        linhas = conn.execute("SELECT id FROM execucao ORDER BY id DESC LIMIT 2").fetchall()
+        posicao = 0 if referencia == 'ultima' else 1
+        if len(linhas) <= posicao:
+            raise SystemExit(f"Histórico sem execução '{referencia}'")
+        return linhas[posicao][0]
+    if referencia.isdigit():
+        return int(referencia)
+    linha = conn.execute("SELECT id FROM execucao WHERE revisao LIKE ? ORDER BY id DESC LIMIT 1",
+                         (referencia + '%',)).fetchone()
+    if not linha:
+        raise SystemExit(f"Nenhuma execução da revisão {referencia}")
+    return linha[0]
+
+def amostras(conn, id_execucao):
+    """(backend, chave, escala, métrica) -> valores."""
+    grupos = {}
+    for backend, chave_amostra, escala, metrica, valor in conn.execute("""
+            SELECT backend, COALESCE(chave, consulta), escala, COALESCE(metrica, 'tempo_s'), COALESCE(valor, tempo_s)
+            FROM amostra WHERE id_execucao = ? AND COALESCE(valor, tempo_s) IS NOT NULL""", (id_execucao,)):
+        grupos.setdefault((backend, chave_amostra, escala, metrica), []).append(valor)
+    return grupos
+
+def diferencas_configuracao(conn, id_base, id_atual):
+    """Opção -> (valor na base, valor na atual), para as opções que diferem entre as execuções."""
+    configuracoes = []
+    for id_execucao in (id_base, id_atual):
+        linha = conn.execute("SELECT script, configuracao FROM execucao WHERE id = ?", (id_execucao,)).fetchone()
+        if not linha:
+            raise SystemExit(f"Execução #{id_execucao} não existe")
+        script, texto = linha
+        configuracoes.append(dict(json.loads(texto or '{}'), script=script))
+    base, atual = configuracoes
+    return {opcao: (base.get(opcao), atual.get(opcao)) for opcao in sorted(base.keys() | atual.keys())
+            if base.get(opcao) != atual.get(opcao)}
+
+def listar(conn, limite=20):
+    print(f"{'#':>5}  {'início':<19}  {'revisão':<18}{'script':<24}{'índices':<12}{'escala':>10}{'registros':>10}")
+    for id_execucao, inicio, revisao, script, perfil, escala, total in conn.execute("""
+            SELECT e.id, e.inicio, e.revisao, e.script, e.perfil_indices, e.escala, COUNT(a.registro)
+            FROM execucao e LEFT JOIN amostra a ON a.id_execucao = e.id
+            GROUP BY e.id ORDER BY e.id DESC LIMIT ?""", (limite,)):
+        print(f"{id_execucao:>5}  {inicio[:19]:<19}  {revisao or '-':<18}{script or '-':<24}{perfil or '-':<12}"
+              f"{escala if escala is not None else '-':>10}{total:>10}")
+
+# --- Comparação ---
+def mann_whitney(a, b):
+    """Valor p bilateral do teste U de Mann-Whitney (aproximação normal, com correção de empates)."""
+    n1, n2 = len(a), len(b)
+    valores = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    postos = [0.0] * len(valores)
+    correcao_empates = 0
+    i = 0
+    while i < len(valores):
+        j = i
+        while j + 1 < len(valores) and valores[j + 1][0] == valores[i][0]:
+            j += 1
+        posto_medio = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            postos[k] = posto_medio
+        empatados = j - i + 1
+        correcao_empates += empatados ** 3 - empatados
+        i = j + 1
+    soma_a = sum(posto for posto, (_, grupo) in zip(postos, valores) if grupo == 0)
+    u = soma_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variancia = n1 * n2 / 12 * ((n + 1) - correcao_empates / (n * (n - 1)))
+    if variancia <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variancia)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+def comparar(base, atual, limiar=0.10, alfa=0.05, minimo=5):
+    """Compara os grupos presentes nas duas execuções; retorna a lista de linhas com o veredito."""
+    linhas = []
+    for grupo in sorted(base.keys() & atual.keys(), key=lambda k: tuple(str(parte) for parte in k)):
+        a, b = base[grupo], atual[grupo]
+        metrica = grupo[3]
+        mediana_a, mediana_b = statistics.median(a), statistics.median(b)
+        variacao = mediana_b / mediana_a - 1 if mediana_a else None
+        p = mann_whitney(a, b) if min(len(a), len(b)) >= minimo else None
+        if p is None or variacao is None:
+            veredito = 'poucas amostras'
+        elif p >= alfa or abs(variacao) <= limiar:
+            veredito = 'igual'
+        else:
+            piorou = variacao < 0 if metrica in METRICAS_VAZAO else variacao > 0
+            veredito = 'REGRESSAO' if piorou else 'melhora'
+        # Tempos em ms na saída; vazões na própria unidade
+        escala_saida = 1 if metrica in METRICAS_VAZAO else 1000
+        linhas.append({'backend': grupo[0], 'chave': grupo[1], 'escala': grupo[2], 'metrica': metrica,
+                       'n_base': len(a), 'n_atual': len(b), 'mediana_base': mediana_a * escala_saida,
+                       'mediana_atual': mediana_b * escala_saida, 'variacao': variacao, 'p': p, 'veredito': veredito})
+    return linhas
+
+def imprimir_comparacao(linhas, id_base, id_atual):
+    print(f"\nExecução #{id_base} -> #{id_atual} (mediana; tempo_s e latencia_s em ms)")
+    print(f"{'backend':<11}{'escala':>10}  {'métrica':<15}{'n':>9}{'base':>11}{'atual':>11}{'variação':>10}"
+          f"{'p':>8}  {'veredito':<17}chave")
+    for l in linhas:
+        variacao = f"{l['variacao']:>+10.1%}" if l['variacao'] is not None else f"{'-':>10}"
+        p = f"{l['p']:>8.3f}" if l['p'] is not None else f"{'-':>8}"
+        escala = l['escala'] if l['escala'] is not None else '-'
+        print(f"{l['backend'] or '-':<11}{escala:>10}  {l['metrica']:<15}{l['n_base']:>4}/{l['n_atual']:<4}"
+              f"{l['mediana_base']:>11.2f}{l['mediana_atual']:>11.2f}{variacao}{p}  {l['veredito']:<17}"
+              f"{l['chave'] or '-'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Histórico de execuções do benchmark")
+    parser.add_argument('--historico', default=CAMINHO_PADRAO, help="Arquivo SQLite do histórico")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comando_listar = comandos.add_parser('listar', help="Lista as execuções mais recentes")
+    comando_listar.add_argument('--limite', type=int, default=20)
+    comando_comparar = comandos.add_parser('comparar', help="Compara duas execuções")
+    comando_comparar.add_argument('base', help="Id, 'ultima', 'penultima' ou prefixo da revisão")
+    comando_comparar.add_argument('atual', help="Id, 'ultima', 'penultima' ou prefixo da revisão")
+    comando_comparar.add_argument('--limiar', type=float, default=0.10,
+                                  help="Variação relativa da mediana a partir da qual se acusa regressão")
+    comando_comparar.add_argument('--alfa', type=float, default=0.05, help="Nível de significância do teste")
+    comando_comparar.add_argument('--minimo', type=int, default=5,
+                                  help="Mínimo de amostras por grupo para aplicar o teste")
+    comando_comparar.add_argument('--estrito', action='store_true',
+                                  help="Recusa comparar execuções com configurações diferentes")
+    args = parser.parse_args()
+
+    conn = abrir(args.historico)
+    if args.comando == 'listar':
+        listar(conn, args.limite)
+    else:
+        id_base, id_atual = resolver_execucao(conn, args.base), resolver_execucao(conn, args.atual)
+        diferencas = diferencas_configuracao(conn, id_base, id_atual)
+        if diferencas:
+            print(f"Aviso: as execuções #{id_base} e #{id_atual} diferem na configuração:")
+            for opcao, (valor_base, valor_atual) in diferencas.items():
+                print(f"  {opcao}: {valor_base!r} -> {valor_atual!r}")
+            if args.estrito:
+                raise SystemExit("Comparação recusada (--estrito)")
+        linhas = comparar(amostras(conn, id_base), amostras(conn, id_atual), args.limiar, args.alfa, args.minimo)
+        if not linhas:
+            print("As execuções não têm consultas em comum na mesma escala.")
+        imprimir_comparacao(linhas, id_base, id_atual)
+        regressoes = [l for l in linhas if l['veredito'] == 'REGRESSAO']
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima de {args.limiar:.0%}")
+            sys.exit(1)
+    conn.close()
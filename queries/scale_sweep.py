@@ -0,0 +1,169 @@
+# scale_sweep.py
+"""
+Varredura de escala: para cada tamanho (número de pedidos, com clientes e produtos na
+proporção padrão de generate_data.escala) carrega os bancos com os loaders de
+generate_data.py, mede a vazão da carga e roda Q1-Q6 com parâmetros sorteados
+(e, com --olap, as consultas analíticas A1-A4 de olap_queries.py).
+
+Ao final imprime, por backend, a tabela de latência (p50) x tamanho com o expoente
+de crescimento (inclinação da reta log-log: ~0 constante, ~1 linear) e, se o
+matplotlib estiver instalado, gera os gráficos de latência e de vazão da carga.
+"""
+import math
+import random
+
+import generate_data
+import resource_sampler
+import client_profiler
+import postgres_queries
+import mongodb_queries
+import cassandra_queries
+import embedded_queries
+import olap_queries
+import storage_report
+from embedded_db import EMBUTIDOS
+from cache_control import preparar_bateria
+from harness import (criar_parser, adicionar_opcoes_amostragem, opcoes_consulta, percentil,
+                     finalizar)
+
+BACKENDS = ['postgres', 'mongodb', 'cassandra'] + EMBUTIDOS
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+
+def executar_suite(backend, amostras, args, rng):
+    """Roda Q1-Q6 para `amostras` pares (cliente, categoria) sorteados."""
+    if backend in EMBUTIDOS:
+        modulo = embedded_queries.como_modulo(backend)
+    else:
+        modulo = {'postgres': postgres_queries, 'mongodb': mongodb_queries, 'cassandra': cassandra_queries}[backend]
+    clientes = modulo.sample_clientes(amostras, args.estrato_clientes, rng)
+    categorias = modulo.sample_categorias(amostras, args.estrato_categorias, rng)
+    preparar_bateria(backend, args.modo_cache)
+    registros = []
+    for (cliente, _), (categoria, _) in zip(clientes, categorias):
+        if backend == 'cassandra':
+            id_cliente, email = cliente
+            registros.extend(modulo.executar_consultas(id_cliente, email, categoria,
+                                                       **opcoes_consulta(args, imprimir=False)))
+        else:
+            email, _ = cliente
+            registros.extend(modulo.executar_consultas(email, categoria, **opcoes_consulta(args, imprimir=False)))
+    return [r for r in registros if r]
+
+def expoente(tamanhos, valores):
+    """Inclinação da regressão linear de log(valor) sobre log(tamanho)."""
+    pontos = [(math.log(t), math.log(v)) for t, v in zip(tamanhos, valores) if v]
+    if len(pontos) < 2:
+        return None
+    media_x = sum(x for x, _ in pontos) / len(pontos)
+    media_y = sum(y for _, y in pontos) / len(pontos)
+    variancia = sum((x - media_x) ** 2 for x, _ in pontos)
+    if not variancia:
+        return None
+    return sum((x - media_x) * (y - media_y) for x, y in pontos) / variancia
+
+def montar_curvas(resultados, tamanhos):
+    """backend -> {consulta: [p50 em ms por tamanho]} e backend -> [linhas/s da carga por tamanho]."""
+    latencias, cargas = {}, {}
+    for registro in resultados:
+        backend, tamanho = registro['backend'], registro['escala']
+        posicao = tamanhos.index(tamanho)
+        if registro['consulta'] == 'ARMAZENAMENTO':
+            continue
+        if registro['consulta'] == 'CARGA':
+            cargas.setdefault(backend, [None] * len(tamanhos))[posicao] = registro['linhas_por_s']
+        else:
+            curva = latencias.setdefault(backend, {}).setdefault(registro['consulta'], [[] for _ in tamanhos])
+            curva[posicao].append(registro['tempo_s'] * 1000)
+    for curvas in latencias.values():
+        for consulta, valores in curvas.items():
+            curvas[consulta] = [percentil(v, 50) for v in valores]
+    return latencias, cargas
+
+def imprimir_tabela(latencias, cargas, tamanhos):
+    for backend in latencias.keys() | cargas.keys():
+        print(f"\n{backend} - p50 (ms) e vazão da carga (linhas/s) por número de pedidos")
+        print(f"{'Consulta':<10}" + "".join(f"{t:>12,}" for t in tamanhos) + f"{'expoente':>10}")
+        linhas = sorted(latencias.get(backend, {}).items())
+        if backend in cargas:
+            linhas.append(('CARGA', cargas[backend]))
+        for consulta, valores in linhas:
+            inclinacao = expoente(tamanhos, valores)
+            print(f"{consulta:<10}" + "".join(f"{v:>12.2f}" if v is not None else f"{'-':>12}" for v in valores)
+                  + (f"{inclinacao:>10.2f}" if inclinacao is not None else f"{'-':>10}"))
+
+def plotar(latencias, cargas, tamanhos, prefixo):
+    """Gera os gráficos log-log em PNG; o matplotlib é opcional."""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib não instalado; gráficos não gerados")
+        return []
+
+    arquivos = []
+    for backend, curvas in latencias.items():
+        fig, ax = plt.subplots()
+        for consulta, valores in sorted(curvas.items()):
+            ax.plot(tamanhos, valores, marker='o', label=consulta)
+        ax.set(xscale='log', yscale='log', xlabel='pedidos', ylabel='p50 (ms)', title=f'Latência x tamanho - {backend}')
+        ax.legend()
+        arquivos.append(f"{prefixo}_latencia_{backend}.png")
+        fig.savefig(arquivos[-1])
+        plt.close(fig)
+
+    if cargas:
+        fig, ax = plt.subplots()
+        for backend, valores in cargas.items():
+            ax.plot(tamanhos, valores, marker='o', label=backend)
+        ax.set(xscale='log', xlabel='pedidos', ylabel='linhas/s', title='Vazão da carga x tamanho')
+        ax.legend()
+        arquivos.append(f"{prefixo}_carga.png")
+        fig.savefig(arquivos[-1])
+        plt.close(fig)
+    print(f"Gráficos gerados: {', '.join(arquivos)}")
+    return arquivos
+
+if __name__ == "__main__":
+    parser = adicionar_opcoes_amostragem(criar_parser("Varredura de escala: carga e Q1-Q6 em vários tamanhos"))
+    parser.add_argument('--tamanhos', type=lambda texto: [int(float(t)) for t in texto.split(',')],
+                        default=TAMANHOS_PADRAO,
+                        help="Números de pedidos, separados por vírgula (aceita 1e4,1e5,...)")
+    parser.add_argument('--backend', choices=BACKENDS + ['todos'], default='todos')
+    parser.add_argument('--graficos', default='escala', help="Prefixo dos arquivos PNG gerados")
+    parser.add_argument('--olap', action='store_true', help="Roda também as consultas analíticas A1-A4")
+    parser.add_argument('--armazenamento', action='store_true',
+                        help="Mede espaço ocupado e bytes escritos após cada carga (storage_report.py)")
+    olap_queries.adicionar_opcoes_olap(parser)
+    args = parser.parse_args()
+    backends = BACKENDS if args.backend == 'todos' else [args.backend]
+    tamanhos = sorted(args.tamanhos)
+    rng = random.Random(args.semente)
+    if args.recursos:
+        resource_sampler.ativar(args.recursos_intervalo)
+    client_profiler.ativar_de_args(args)
+
+    resultados = []
+    for tamanho in tamanhos:
+        num_clientes, num_produtos, num_pedidos = generate_data.escala(tamanho)
+        print(f"\n=== {num_pedidos:,} pedidos, {num_clientes:,} clientes, {num_produtos:,} produtos ===")
+        dados = generate_data.gerar_dados(num_clientes, num_produtos, num_pedidos)
+        for backend in backends:
+            if args.armazenamento:
+                resultados.extend(storage_report.carregar_e_medir(backend, dados, escala=tamanho))
+            else:
+                resultados.append(generate_data.carregar_medindo(backend, dados, escala=tamanho))
+            registros = executar_suite(backend, max(args.amostras, 1), args, rng)
+            if args.olap and backend in olap_queries.BACKENDS_OLAP:
+                registros.extend(r for r in olap_queries.executar_olap(
+                    backend, paralelo=args.paralelo, forcar_paralelo=args.forcar_paralelo,
+                    **opcoes_consulta(args, imprimir=False)) if r)
+            for registro in registros:
+                registro['escala'] = tamanho
+                resultados.append(registro)
+        del dados
+
+    latencias, cargas = montar_curvas(resultados, tamanhos)
+    imprimir_tabela(latencias, cargas, tamanhos)
+    plotar(latencias, cargas, tamanhos, args.graficos)
+    finalizar(resultados, args)
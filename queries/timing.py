@@ -0,0 +1,119 @@
+# timing.py
+"""
+Camada de medição compartilhada pelos scripts de consulta. Usa time.perf_counter_ns()
+(monotônico, resolução de nanossegundos) e separa o tempo de cada consulta em fases:
+
+- servidor: do envio da requisição até a chegada da primeira resposta (execução + rede)
+- transferencia: busca das páginas/lotes seguintes
+- decodificacao: conversão do formato do driver em objetos Python
+- outros: restante do intervalo medido (processamento no cliente, p.ex. filtros do Cassandra)
+- formatacao: formatação e impressão das linhas, medida à parte do tempo da consulta
+"""
+import threading
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+import client_profiler
+
+FASES = ('servidor', 'transferencia', 'decodificacao', 'outros', 'formatacao')
+
+class Cronometro:
+    def __init__(self):
+        self.fases_ns = dict.fromkeys(FASES, 0)
+        # Decodificação feita pelo driver fora da thread principal, uma entrada por página
+        self.decodificacao_driver_ns = []
+        self.primeira_linha_ns = None
+        self.fim_ns = None
+        self.linhas = 0
+        self._lock = threading.Lock()
+        self.inicio_ns = perf_counter_ns()
+
+    def decorrido_ns(self):
+        return perf_counter_ns() - self.inicio_ns
+
+    def acumular(self, fase, ns):
+        with self._lock:
+            self.fases_ns[fase] += ns
+
+    @contextmanager
+    def medir(self, fase):
+        with client_profiler.fase(fase):
+            inicio = perf_counter_ns()
+            try:
+                yield
+            finally:
+                self.acumular(fase, perf_counter_ns() - inicio)
+
+    def marcar_linhas(self, quantidade=1):
+        if quantidade and self.primeira_linha_ns is None:
+            self.primeira_linha_ns = self.decorrido_ns()
+        self.linhas += quantidade
+
+    def parar(self):
+        """Fim da obtenção dos dados; a formatação é medida depois, à parte."""
+        self.fim_ns = self.decorrido_ns()
+        if self.decodificacao_driver_ns:
+            # A decodificação na thread de IO ocorreu enquanto a thread principal esperava
+            primeira, *demais = self.decodificacao_driver_ns
+            self._mover_para_decodificacao('servidor', primeira)
+            self._mover_para_decodificacao('transferencia', sum(demais))
+        medidos = sum(self.fases_ns[fase] for fase in ('servidor', 'transferencia', 'decodificacao'))
+        self.fases_ns['outros'] = max(0, self.fim_ns - medidos)
+
+    def _mover_para_decodificacao(self, fase, ns):
+        self.fases_ns[fase] -= min(ns, self.fases_ns[fase])
+        self.fases_ns['decodificacao'] += ns
+
+    @property
+    def tempo_s(self):
+        return self.fim_ns / 1e9
+
+    def registro(self):
+        """Campos de tempo para novo_registro()."""
+        return {
+            'linhas': self.linhas,
+            'tempo_primeira_linha_s': self.primeira_linha_ns / 1e9 if self.primeira_linha_ns is not None else None,
+            'tempo_ultima_linha_s': self.tempo_s,
+            'fases_ms': {fase: ns / 1e6 for fase, ns in self.fases_ns.items()},
+        }
+
+    def resumo(self):
+        return " | ".join(f"{fase}: {ns / 1e6:.3f} ms" for fase, ns in self.fases_ns.items())
+
+def medir_stream(linhas, cronometro, fase_primeira='servidor', fase='transferencia'):
+    """
+    Repassa as linhas contando-as. O tempo de cada next() é somado a `fase_primeira`
+    até a primeira linha e a `fase` depois dela (esperas por páginas/lotes).
+    """
+    iterador = iter(linhas)
+    fase_atual = fase_primeira
+    while True:
+        inicio = perf_counter_ns()
+        try:
+            linha = next(iterador)
+        except StopIteration:
+            cronometro.acumular(fase_atual, perf_counter_ns() - inicio)
+            return
+        cronometro.acumular(fase_atual, perf_counter_ns() - inicio)
+        fase_atual = fase
+        cronometro.marcar_linhas()
+        yield linha
+
+def consumir_stream(linhas, cronometro, guardar=True, **fases):
+    """Consome o stream inteiro; as linhas só ficam em memória se `guardar` (para impressão)."""
+    stream = medir_stream(linhas, cronometro, **fases)
+    if guardar:
+        return list(stream)
+    deque(stream, maxlen=0)
+    return []
+
+def fabrica_linhas_medida(cronometro, fabrica):
+    """Envolve a row_factory do Cassandra para medir a decodificação feita na thread de IO do driver."""
+    def fabrica_medida(colnames, rows):
+        inicio = perf_counter_ns()
+        try:
+            return fabrica(colnames, rows)
+        finally:
+            cronometro.decodificacao_driver_ns.append(perf_counter_ns() - inicio)
+    return fabrica_medida